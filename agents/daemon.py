@@ -0,0 +1,116 @@
+import os, sys, json, time, socket, signal, socketserver, threading
+from typing import Callable, Dict, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOCKET_PATH = os.environ.get("AGENT_SOCKET", os.path.join(PROJECT_ROOT, "data", "agent.sock"))
+
+# Wire protocol: one JSON object per line each way.
+#   {"op": "ping"}                                                     -> {"ok": true, "result": {"pid", "uptime_s"}}
+#   {"op": "classify", "feature_name": ..., "feature_description": ...} -> {"ok": true, "result": <run_once result>}
+#   {"op": "stats"}                                                    -> {"ok": true, "result": {...}}
+# Failures come back as {"ok": false, "error": "..."}.
+
+
+def request(payload: Dict, path: str = SOCKET_PATH, timeout: float = 600.0) -> Optional[Dict]:
+    """
+    Send one request to a running daemon and return its reply, or None when no
+    daemon is listening on `path` or it does not answer within `timeout`
+    (callers then run in-process).
+    """
+    if not os.path.exists(path):
+        return None
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    s.settimeout(timeout)
+    try:
+        s.connect(path)
+    except OSError:
+        s.close()
+        return None
+    buf = b""
+    with s:
+        try:
+            s.sendall(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+            while not buf.endswith(b"\n"):
+                chunk = s.recv(65536)
+                if not chunk:
+                    break
+                buf += chunk
+        except OSError as e:  # socket.timeout included: a hung daemon is treated like none at all
+            print(f"X daemon at {path} did not answer ({e}); running in-process", file=sys.stderr)
+            return None
+    try:
+        return json.loads(buf) if buf.strip() else None
+    except ValueError:
+        print(f"X daemon at {path} sent a truncated reply; running in-process", file=sys.stderr)
+        return None
+
+
+def _stats() -> Dict:
+    from rag.retriever import retriever_stats
+    from llm.cache import cache_stats
+    from llm.local_llm import backend_stats
+    return {"retriever": retriever_stats(), "llm_cache": cache_stats(), "llm": backend_stats()}
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, classify: Callable[[str, str], Dict]):
+        self.classify = classify
+        self.started = time.time()
+        super().__init__(path, _Handler)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # a client may send several requests over one connection
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+                op = req.get("op")
+                if op == "ping":
+                    out = {"pid": os.getpid(), "uptime_s": round(time.time() - self.server.started, 1)}
+                elif op == "classify":
+                    out = self.server.classify(req["feature_name"], req.get("feature_description", ""))
+                elif op == "stats":
+                    out = _stats()
+                else:
+                    raise ValueError(f"unknown op {op!r}")
+                reply = {"ok": True, "result": out}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(reply, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+def serve(classify: Callable[[str, str], Dict], path: str = SOCKET_PATH, k: int = 5) -> None:
+    """
+    Warm everything once, then answer requests on a Unix socket until SIGINT/SIGTERM.
+    `classify(name, desc)` produces (and persists) one result.
+    """
+    if request({"op": "ping"}, path=path, timeout=2.0) is not None:
+        raise SystemExit(f"a daemon is already listening on {path}")
+    if os.path.exists(path):
+        os.remove(path)  # stale socket from a daemon that did not shut down cleanly
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    from agents.runners import warm
+    t0 = time.perf_counter()
+    warm(k=k)
+    print(f"warm in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    server = _Server(path, classify)
+    os.chmod(path, 0o600)
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"listening on {path} (pid {os.getpid()})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,118 +1,255 @@
-import os, json, time, csv
-from typing import Dict, List, Tuple
+import os, json, time, asyncio
+from typing import Dict, List, Optional, Tuple
 
+from agents import tracing
 from agents.schemas import Classification, AuditResult
 from agents.prompts import (
     CLASSIFIER_PROMPT as CLASSIFIER_SYS_A,
     AUDITOR_PROMPT_STRICT as AUDITOR_SYS_STRICT,
     AUDITOR_PROMPT_RISK as AUDITOR_SYS_RISK,
 )
-from rag.retriever import get_retriever
-from llm.local_llm import generate_json  # <-- NEW
-from catalog.dir_load import laws_by_jurisdiction, flat_rules_index
-
-
-by_j = laws_by_jurisdiction()
-eu_laws = by_j.get("EU", [])
+# model, index and catalog load on first use; rag.* and store.decision_index (llama-index,
+# numpy, faiss) are imported inside the stages that need them to keep startup fast
+from llm.local_llm import generate_json, generate_json_batch, is_cacheable, response_key, count_tokens, get_backend
+from llm.cache import get_cache
+from catalog.dir_load import get_catalog, laws_by_jurisdiction, search_rules
+from catalog.matcher import get_matcher
+from store.results import get_store
 
 
 CLASSIFIER_SYS_B = CLASSIFIER_SYS_A + "\nAdopt a pragmatic, risk-aware interpretation when evidence is ambiguous."
 
+# "full": both classifiers and both auditors on every feature.
+# "adaptive": classifier A first, B only below COMMITTEE_CONF, auditors only on escalation.
+COMMITTEE_POLICY = os.environ.get("COMMITTEE_POLICY", "full")
+COMMITTEE_CONF = float(os.environ.get("COMMITTEE_CONF", "0.85"))
+# risk mode: a positive label is always audited, however confident
+COMMITTEE_RISK_MODE = os.environ.get("COMMITTEE_RISK_MODE", "1") != "0"
+
 def parse_json_strict(text: str) -> dict:
     s = text.strip()
     if s.startswith("```"):
         s = s.strip("`")
         if "\n" in s:
             s = s.split("\n", 1)[1]
-    return json.loads(s)
+    try:
+        return json.loads(s)
+    except json.JSONDecodeError:
+        # generation stops at the closing brace, but tolerate stray text around the object
+        start = s.find("{")
+        if start < 0:
+            raise
+        return json.JSONDecoder().raw_decode(s[start:])[0]
+
+_FIX_SUFFIX = "\n\nYour previous output was invalid JSON. Return VALID JSON only per the schema. No prose."
+
+def _llm_params(temperature: float, json_schema: Optional[dict]) -> dict:
+    params = {"temperature": temperature}
+    if json_schema:
+        params["json_schema"] = json_schema
+    return params
+
+def _json_cache_key(system_prompt: str, user_prompt: str, params: dict, prefix: Optional[str]) -> Optional[str]:
+    # parsed results are cached separately from raw text so a hit also skips the retry path
+    if get_cache() is None or not is_cacheable(params):
+        return None
+    return response_key(system_prompt, user_prompt, params, prefix, kind="json")
+
+def _json_cache_get(key: Optional[str]) -> Optional[dict]:
+    if key is None:
+        return None
+    hit = get_cache().get(key)
+    return json.loads(hit) if hit is not None else None
 
-def call_llm_json(system_prompt: str, user_prompt: str, temperature: float = 0.0) -> dict:
-    out = generate_json(system_prompt, user_prompt, temperature=temperature)
+def _json_cache_put(key: Optional[str], data: dict) -> None:
+    if key is not None:
+        get_cache().put(key, json.dumps(data, ensure_ascii=False))
+
+def call_llm_json(system_prompt: str, user_prompt: str, temperature: float = 0.0, prefix: Optional[str] = None, json_schema: Optional[dict] = None) -> dict:
+    key = _json_cache_key(system_prompt, user_prompt, _llm_params(temperature, json_schema), prefix)
+    tracing.incr("llm_calls")
+    hit = _json_cache_get(key)
+    if hit is not None:
+        tracing.incr("cache_hits")
+        return hit
+    out = generate_json(system_prompt, user_prompt, temperature=temperature, prefix=prefix, json_schema=json_schema)
     try:
-        return parse_json_strict(out)
+        data = parse_json_strict(out)
     except Exception:
-        fix_user = user_prompt + "\n\nYour previous output was invalid JSON. Return VALID JSON only per the schema. No prose."
-        out2 = generate_json(system_prompt, fix_user, temperature=temperature)
-        return parse_json_strict(out2)
-
-def format_retrieved_chunks(resp) -> Tuple[str, List[Dict]]:
-    chunks, sources = [], []
-    for i, node in enumerate(resp.source_nodes):
-        text = node.node.get_content(metadata_mode="none")
-        meta = dict(node.node.metadata or {})
-        chunks.append(f"[CTX {i+1}] {text}")
-        sources.append(meta)
-    return "\n\n".join(chunks), sources
-
-def build_classifier_user(feature_text: str, retrieved_text: str) -> str:
-    schema = json.dumps(Classification.model_json_schema(), indent=2)
+        tracing.incr("json_retries")
+        fix_user = user_prompt + _FIX_SUFFIX
+        out2 = generate_json(system_prompt, fix_user, temperature=temperature, prefix=prefix, json_schema=json_schema)
+        data = parse_json_strict(out2)
+    _json_cache_put(key, data)
+    return data
+
+def call_llm_json_batch(calls: List[Tuple[str, str, float]], prefix: Optional[str] = None, json_schema: Optional[dict] = None) -> List[dict]:
+    """
+    Batched call_llm_json: (system, user, temperature) triples share one forward pass,
+    and any invalid outputs are retried together in a second batch.
+    """
+    params = [_llm_params(t, json_schema) for _, _, t in calls]
+    keys = [_json_cache_key(s, u, p, prefix) for (s, u, _), p in zip(calls, params)]
+    results: List[dict] = [_json_cache_get(k) for k in keys]
+    todo = [i for i, r in enumerate(results) if r is None]
+    tracing.incr("llm_calls", len(calls))
+    tracing.incr("cache_hits", len(calls) - len(todo))
+    if not todo:
+        return results
+    outs = generate_json_batch([(calls[i][0], calls[i][1], params[i]) for i in todo], prefix=prefix)
+    retry = []
+    for i, out in zip(todo, outs):
+        try:
+            results[i] = parse_json_strict(out)
+        except Exception:
+            retry.append(i)
+    if retry:
+        tracing.incr("json_retries", len(retry))
+        outs2 = generate_json_batch([(calls[i][0], calls[i][1] + _FIX_SUFFIX, params[i]) for i in retry], prefix=prefix)
+        for i, out in zip(retry, outs2):
+            results[i] = parse_json_strict(out)
+    for i in todo:
+        _json_cache_put(keys[i], results[i])
+    return results
+
+def build_context_prefix(feature_text: str, retrieved_text: str) -> str:
+    """
+    FEATURE + RETRIEVED CONTEXT block shared by all four committee prompts.
+    Passed as the LLM prompt prefix so its KV cache is computed once per feature.
+    """
     return (
         "FEATURE:\n" + feature_text + "\n\n"
         "RETRIEVED CONTEXT (laws/glossary/examples):\n" + retrieved_text + "\n\n"
-        "Return ONLY valid JSON that matches this schema (no extra text):\n" + schema
     )
 
-def build_auditor_user(feature_text: str, retrieved_text: str, cA: Classification, cB: Classification) -> str:
+def build_classifier_task() -> str:
+    schema = json.dumps(Classification.model_json_schema(), indent=2)
+    return "Return ONLY valid JSON that matches this schema (no extra text):\n" + schema
+
+def build_auditor_task(cA: Classification, cB: Optional[Classification]) -> str:
     schema = json.dumps(AuditResult.model_json_schema(), indent=2)
+    # classifier B is skipped by the adaptive policy when A is confident
+    b = ("CLASSIFIER_B:\n" + cB.model_dump_json(indent=2) + "\n\n") if cB is not None else ""
     return (
-        "FEATURE:\n" + feature_text + "\n\n"
-        "RETRIEVED CONTEXT:\n" + retrieved_text + "\n\n"
-        "CLASSIFIER_A:\n" + cA.model_dump_json(indent=2) + "\n\n"
-        "CLASSIFIER_B:\n" + cB.model_dump_json(indent=2) + "\n\n"
+        "CLASSIFIER_A:\n" + cA.model_dump_json(indent=2) + "\n\n" + b +
         "Return ONLY valid JSON that matches this schema (no extra text):\n" + schema
     )
 
-def classify(feature_text: str, retrieved_text: str, system_prompt: str, temperature: float = 0.0) -> Classification:
-    user = build_classifier_user(feature_text, retrieved_text)
-    data = call_llm_json(system_prompt, user, temperature=temperature)
+@tracing.traced("classify_pair")
+def classify_pair(feature_text: str, retrieved_text: str) -> Tuple[Classification, Classification]:
+    prefix = build_context_prefix(feature_text, retrieved_text)
+    task = build_classifier_task()
+    dA, dB = call_llm_json_batch([
+        (CLASSIFIER_SYS_A, task, 0.0),
+        (CLASSIFIER_SYS_B, task, 0.3),
+    ], prefix=prefix, json_schema=Classification.model_json_schema())
+    return Classification(**dA), Classification(**dB)
+
+@tracing.traced("audit_pair")
+def audit_pair(feature_text: str, retrieved_text: str, cA: Classification, cB: Optional[Classification]) -> Tuple[AuditResult, AuditResult]:
+    # same prefix as classify_pair, so the cached KV from the classifier pass is reused
+    prefix = build_context_prefix(feature_text, retrieved_text)
+    task = build_auditor_task(cA, cB)
+    dS, dR = call_llm_json_batch([
+        (AUDITOR_SYS_STRICT, task, 0.0),
+        (AUDITOR_SYS_RISK, task, 0.0),
+    ], prefix=prefix, json_schema=AuditResult.model_json_schema())
+    return AuditResult(**dS), AuditResult(**dR)
+
+def _classify_one(feature_text: str, retrieved_text: str, system_prompt: str, temperature: float, label: str) -> Classification:
+    # prefixed like classify_pair, so B and the auditors reuse A's prefix KV cache
+    with tracing.span(label):
+        data = call_llm_json(system_prompt, build_classifier_task(), temperature=temperature,
+                             prefix=build_context_prefix(feature_text, retrieved_text),
+                             json_schema=Classification.model_json_schema())
     return Classification(**data)
 
-def audit(feature_text: str, retrieved_text: str, cA: Classification, cB: Classification, system_prompt: str) -> AuditResult:
-    user = build_auditor_user(feature_text, retrieved_text, cA, cB)
-    data = call_llm_json(system_prompt, user, temperature=0.0)
-    return AuditResult(**data)
+@tracing.traced("committee")
+def committee(feature_text: str, retrieved_text: str) -> Tuple[Classification, Optional[Classification], Optional[AuditResult], Optional[AuditResult], List[str]]:
+    """
+    Run the committee under COMMITTEE_POLICY. Returns (cA, cB, aStrict, aRisk, policy_path);
+    members the adaptive policy skipped are None, and policy_path lists the steps taken.
+    """
+    if COMMITTEE_POLICY != "adaptive":
+        cA, cB = classify_pair(feature_text, retrieved_text)
+        aStrict, aRisk = audit_pair(feature_text, retrieved_text, cA, cB)
+        return cA, cB, aStrict, aRisk, ["full"]
+    path = ["A"]
+    cA = _classify_one(feature_text, retrieved_text, CLASSIFIER_SYS_A, 0.0, "classifier_A")
+    cB = None
+    if cA.confidence < COMMITTEE_CONF:
+        cB = _classify_one(feature_text, retrieved_text, CLASSIFIER_SYS_B, 0.3, "classifier_B")
+        path.append("B:low_confidence")
+    votes = [c for c in (cA, cB) if c is not None]
+    reasons = []
+    if len({c.needs_geo_compliance for c in votes}) > 1:
+        reasons.append("disagreement")
+    if sum(c.confidence for c in votes) / len(votes) < COMMITTEE_CONF:
+        reasons.append("low_confidence")
+    if COMMITTEE_RISK_MODE and any(c.needs_geo_compliance for c in votes):
+        reasons.append("positive")
+    if not reasons:
+        return cA, cB, None, None, path
+    aStrict, aRisk = audit_pair(feature_text, retrieved_text, cA, cB)
+    path.append("auditors:" + ",".join(reasons))
+    return cA, cB, aStrict, aRisk, path
 
-def run_once(feature_name: str, feature_desc: str, k: int = 5) -> dict:
-    feature_text = f"{feature_name}\n{feature_desc}".strip()
-    # 1) catalog context
-    cat_ctx, cat_ids = _catalog_context_for_feature(feature_text, max_laws_per_j=2, max_rules_per_law=2)
-    if not cat_ctx:
-        cat_ctx, cat_ids = _catalog_fallback_all_rules(feature_text, top_k=4)
-    
-    # 2) vector RAG
-    qe = get_retriever(k=k)
-    resp = qe.query(feature_text)
-    retrieved_text, retrieval_sources = format_retrieved_chunks(resp)
-    
-    # 3) combine
-    combined_context = (cat_ctx + "\n\n" + retrieved_text).strip() if cat_ctx else retrieved_text
-
-    # ---- committee (unchanged) ----
-    cA = classify(feature_text, combined_context, system_prompt=CLASSIFIER_SYS_A, temperature=0.0)
-    cB = classify(feature_text, combined_context, system_prompt=CLASSIFIER_SYS_B, temperature=0.3)
-    aStrict = audit(feature_text, combined_context, cA, cB, system_prompt=AUDITOR_SYS_STRICT)
-    aRisk   = audit(feature_text, combined_context, cA, cB, system_prompt=AUDITOR_SYS_RISK)
-
-    both_no = (not cA.needs_geo_compliance) and (not cB.needs_geo_compliance)
-    both_approve = aStrict.approve and aRisk.approve
+@tracing.traced("catalog")
+def _catalog_stage(feature_text: str) -> Tuple[List[str], List[str], List[str]]:
+    # (catalog snippets, their "J:rule_id"s, jurisdictions named in the feature)
+    matcher = get_matcher()
+    m = matcher.match(feature_text)
+    tracing.annotate(jurisdictions=m["jurisdictions"], statutes=m["statutes"], glossary=[t for t, _ in m["glossary"]])
+    cat_parts, cat_ids = _catalog_context_for_feature(m["jurisdictions"], max_laws_per_j=2, max_rules_per_law=2)
+    if not cat_parts:
+        cat_parts, cat_ids = _catalog_fallback_all_rules(matcher.expand_query(feature_text, m), top_k=4)
+    return cat_parts, cat_ids, m["jurisdictions"]
+
+def _retrieval_query(feature_text: str) -> str:
+    # glossary acronyms spelled out; prefetch embeds the same string so its cache entries hit
+    return get_matcher().expand_query(feature_text)
+
+@tracing.traced("retrieval")
+def _retrieval_stage(feature_text: str, k: int) -> List[Tuple[str, Dict]]:
+    # BM25 + dense fused and deduplicated, best first; see rag.hybrid
+    from rag.hybrid import hybrid_query
+    resp = hybrid_query(_retrieval_query(feature_text), k=k)
+    return [(sn.node.get_content(metadata_mode="none"), dict(sn.node.metadata or {})) for sn in resp.source_nodes]
+
+@tracing.traced("pack_context")
+def _combine_context(cat_parts: List[str], cat_ids: List[str], chunks: List[Tuple[str, Dict]]) -> Tuple[str, List[str], List[Dict]]:
+    # catalog snippets first, then retrieved chunks by score until RAG_CONTEXT_TOKENS is used up;
+    # only the rule ids whose snippets made it into the prompt are returned
+    from rag.hybrid import pack_context
+    context, n_cat, sources = pack_context(cat_parts, chunks, count_tokens=count_tokens)
+    return context, cat_ids[:n_cat], sources
+
+def _build_result(feature_name: str, cat_ids: List[str], retrieval_sources: List[Dict],
+                  cA: Classification, cB: Optional[Classification], aStrict: Optional[AuditResult], aRisk: Optional[AuditResult],
+                  policy_path: Optional[List[str]] = None) -> dict:
+    # skipped members (adaptive policy) are None; with all four present this is the full-committee rule
+    votes = [c for c in (cA, cB) if c is not None]
+    audits = [a for a in (aStrict, aRisk) if a is not None]
+    both_no = not any(c.needs_geo_compliance for c in votes)
+    both_approve = all(a.approve for a in audits)
     if both_no and both_approve:
         final = False
     else:
-        yes_votes = int(cA.needs_geo_compliance) + int(cB.needs_geo_compliance)
-        corrections = [x for x in (aStrict.corrected_label, aRisk.corrected_label) if x is not None]
+        yes_votes = sum(int(c.needs_geo_compliance) for c in votes)
+        corrections = [a.corrected_label for a in audits if a.corrected_label is not None]
         if len(corrections) == 2 and corrections[0] == corrections[1]:
             final = bool(corrections[0])
         else:
             final = yes_votes >= 1 or any(corrections)
 
-    regs = sorted(set((cA.regulation_candidates or []) + (cB.regulation_candidates or [])))
-    for aud in (aStrict, aRisk):
+    regs = sorted(set(r for c in votes for r in (c.regulation_candidates or [])))
+    for aud in audits:
         if aud.corrected_regs:
             regs.extend(aud.corrected_regs)
     regs = sorted(set(regs))[:6]
 
-    conf = round((cA.confidence + cB.confidence)/2.0, 3)
-    if both_no and both_approve:
+    conf = round(sum(c.confidence for c in votes) / len(votes), 3)
+    if both_no and both_approve and audits:
         conf = max(conf, 0.85)
 
     result = {
@@ -122,12 +259,13 @@ def run_once(feature_name: str, feature_desc: str, k: int = 5) -> dict:
         "regulations": regs,
         "catalog_rule_ids": cat_ids,             
         "classifier_A": cA.model_dump(),
-        "classifier_B": cB.model_dump(),
-        "auditor_strict": aStrict.model_dump(),
-        "auditor_risk": aRisk.model_dump(),
+        "classifier_B": cB.model_dump() if cB is not None else None,
+        "auditor_strict": aStrict.model_dump() if aStrict is not None else None,
+        "auditor_risk": aRisk.model_dump() if aRisk is not None else None,
+        "committee_policy": COMMITTEE_POLICY,
+        "policy_path": policy_path or ["full"],
         "retrieval_sources": retrieval_sources,
         "timestamp": time.time(),
-        "catalog_rule_ids": "|".join(row.get("catalog_rule_ids", [])),
         "models": {
             "voter_A": os.environ.get("LLM_MODEL_ID", "Qwen/Qwen2.5-1.5B-Instruct"),
             "voter_B": os.environ.get("LLM_MODEL_ID", "Qwen/Qwen2.5-1.5B-Instruct"),
@@ -140,69 +278,221 @@ def run_once(feature_name: str, feature_desc: str, k: int = 5) -> dict:
     }
     return result
 
-def append_csv(row: dict, csv_path: str = "data/outputs.csv"):
-    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-    headers = [
-        "feature_name", "needs_geo_compliance", "confidence",
-        "regulations", "classifier_A", "classifier_B",
-        "auditor_strict", "auditor_risk", "retrieval_sources",
-        "timestamp", "models", "embeddings"
-    ]
-    exists = os.path.exists(csv_path)
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=headers)
-        if not exists:
-            w.writeheader()
-        w.writerow({
-            "feature_name": row["feature_name"],
-            "needs_geo_compliance": row["needs_geo_compliance"],
-            "confidence": row["confidence"],
-            "catalog_rule_ids": "|".join(row.get("catalog_rule_ids", [])),
-            "regulations": "|".join(row["regulations"]),
-            "classifier_A": json.dumps(row["classifier_A"], ensure_ascii=False),
-            "classifier_B": json.dumps(row["classifier_B"], ensure_ascii=False),
-            "auditor_strict": json.dumps(row["auditor_strict"], ensure_ascii=False),
-            "auditor_risk": json.dumps(row["auditor_risk"], ensure_ascii=False),
-            "retrieval_sources": json.dumps(row["retrieval_sources"], ensure_ascii=False),
-            "timestamp": row["timestamp"],
-            "models": json.dumps(row["models"], ensure_ascii=False),
-            "embeddings": row["embeddings"],
+@tracing.traced("similar")
+def _similar_stage(feature_text: str, top_k: int = 5) -> List[Dict]:
+    """
+    Nearest prior decisions by feature embedding, best first, with their labels.
+    Only each feature's newest decision counts: a re-audited feature keeps its old
+    verdict's vector in the index, with the same similarity as the new one.
+    """
+    from store.decision_index import get_decision_index, embed_feature
+    hits = get_decision_index().search(embed_feature(feature_text), k=top_k * 2)
+    store = get_store()
+    current = store.current_ids(did for did, _ in hits)
+    hits = [(did, sim) for did, sim in hits if did in current][:top_k]
+    out = []
+    for did, sim in hits:
+        rec = store.get(did)
+        if rec is None:
+            continue
+        out.append({
+            "decision_id": did,
+            "feature_name": rec.get("feature_name"),
+            "needs_geo_compliance": rec.get("needs_geo_compliance"),
+            "confidence": rec.get("confidence"),
+            "regulations": rec.get("regulations"),
+            "similarity": round(sim, 4),
         })
+    return out
 
-from catalog.dir_load import laws_by_jurisdiction, flat_rules_index
+def _legal_scope(text: str) -> Tuple[frozenset, frozenset]:
+    m = get_matcher().match(text)
+    return frozenset(m["jurisdictions"]), frozenset(m["statutes"])
 
-def _guess_jurisdictions(text: str) -> list[str]:
-    t = text.lower()
-    js = []
-    if any(k in t for k in ["eea", "eu", "european union", "europe"]): js.append("EU")
-    if "utah" in t: js.append("US-Utah")
-    if "florida" in t: js.append("US-Florida")
-    if "california" in t or " ca " in t: js.append("US-California")
-    if any(k in t for k in ["ncmec", "federal", "18 u.s.c", "us code", "us federal"]): js.append("US-Federal")
-    return list(dict.fromkeys(js))
+def _reuse_result(feature_name: str, feature_text: str, similar: List[Dict]) -> Optional[dict]:
+    """
+    Near-duplicate fast path: reuse an already-audited verdict instead of running the committee.
+    Embeddings barely move when only the jurisdiction or statute changes ("... in Utah" vs
+    "... in Florida"), so the prior must also name the same jurisdictions and statutes.
+    """
+    from store.decision_index import REUSE_SIM
+    if not similar or similar[0]["similarity"] < REUSE_SIM:
+        return None
+    store = get_store()
+    source_id = similar[0]["decision_id"]
+    prior = store.get(source_id)
+    if prior is not None and prior.get("reused_from"):
+        # a resubmitted feature's newest decision is often itself a reuse: follow it back to
+        # the committee run it copied, so the fast path does not alternate with full runs
+        source_id = prior["reused_from"].get("decision_id")
+        prior = store.get(source_id) if source_id is not None else None
+    if prior is None or prior.get("reused_from"):
+        # only reuse verdicts that came out of a real committee run
+        return None
+    if not prior.get("feature_description"):
+        # stored before descriptions were kept: its legal scope cannot be checked
+        return None
+    prior_text = f"{prior.get('feature_name') or ''}\n{prior['feature_description']}".strip()
+    if _legal_scope(prior_text) != _legal_scope(feature_text):
+        return None
+    result = dict(prior)
+    result.pop("similar_features", None)
+    result.pop("feature_description", None)
+    result.update({
+        "feature_name": feature_name,
+        "timestamp": time.time(),
+        "similar_decisions": similar,
+        "reused_from": {"decision_id": source_id, "feature_name": prior.get("feature_name"), "similarity": similar[0]["similarity"]},
+    })
+    return result
+
+def prefetch(features: List[Tuple[str, str]]) -> None:
+    """
+    Embed the retrieval queries and similarity keys of upcoming (name, desc) features
+    in one batch each, so the per-feature calls below hit the embedding cache.
+    """
+    from rag.retriever import embed_queries, embed_texts
+    texts = [f"{n}\n{d}".strip() for n, d in features]
+    if texts:
+        embed_queries([_retrieval_query(t) for t in texts])
+        embed_texts(texts)
+
+def warm(k: int = 5) -> None:
+    """
+    Load the LLM backend, retrieval indexes, catalog and decision index up front
+    (batch runner, daemon) instead of on the first feature.
+    """
+    from rag.hybrid import warm as warm_retrieval
+    from store.decision_index import get_decision_index
+    get_backend()
+    warm_retrieval(k=k)
+    get_catalog()
+    get_decision_index()
+
+def run_once(feature_name: str, feature_desc: str, k: int = 5, reuse: bool = True) -> dict:
+    """
+    Classify one feature. result["trace"] holds the per-stage spans (see agents.tracing).
+    reuse=False always runs the committee (re-audits, where the prior verdict is stale).
+    """
+    with tracing.trace() as tr, tracing.profiled(feature_name), tracing.span("run_once"):
+        result = _run_once(feature_name, feature_desc, k, reuse)
+    result["trace"] = tr.spans
+    return result
+
+def _run_once(feature_name: str, feature_desc: str, k: int, reuse: bool = True) -> dict:
+    feature_text = f"{feature_name}\n{feature_desc}".strip()
+    # 0) prior decisions; near-duplicates reuse the audited verdict
+    similar = _similar_stage(feature_text)
+    reused = _reuse_result(feature_name, feature_text, similar) if reuse else None
+    if reused is not None:
+        return reused
+    # 1) catalog context
+    cat_parts, cat_ids, jurisdictions = _catalog_stage(feature_text)
+    # 2) vector RAG
+    chunks = _retrieval_stage(feature_text, k)
+    # 3) combine within the token budget
+    combined_context, cat_ids, retrieval_sources = _combine_context(cat_parts, cat_ids, chunks)
+
+    # ---- committee: full runs each pair as one batched generation, adaptive escalates ----
+    cA, cB, aStrict, aRisk, path = committee(feature_text, combined_context)
+    result = _build_result(feature_name, cat_ids, retrieval_sources, cA, cB, aStrict, aRisk, path)
+    result["similar_decisions"] = similar
+    # kept so a law added later in a named jurisdiction flags this decision for re-audit
+    result["jurisdictions"] = jurisdictions
+    return result
+
+async def run_once_async(feature_name: str, feature_desc: str, k: int = 5, executor=None, reuse: bool = True) -> dict:
+    """
+    Async run_once: catalog lookup and vector retrieval run concurrently, then the
+    committee runs under COMMITTEE_POLICY. Blocking work goes to `executor`
+    (the loop's default when None). Returns the same dict as run_once.
+    """
+    with tracing.trace() as tr, tracing.profiled(feature_name), tracing.span("run_once"):
+        result = await _run_once_async(feature_name, feature_desc, k, executor, reuse)
+    result["trace"] = tr.spans
+    return result
 
-def _catalog_context_for_feature(feature_text: str, max_laws_per_j=2, max_rules_per_law=2) -> tuple[str, list[str]]:
+async def _run_once_async(feature_name: str, feature_desc: str, k: int, executor, reuse: bool = True) -> dict:
+    loop = asyncio.get_running_loop()
+    feature_text = f"{feature_name}\n{feature_desc}".strip()
+    # bind: executor threads would otherwise not see the current trace
+    (cat_parts, cat_ids, jurisdictions), chunks, similar = await asyncio.gather(
+        loop.run_in_executor(executor, tracing.bind(_catalog_stage), feature_text),
+        loop.run_in_executor(executor, tracing.bind(_retrieval_stage), feature_text, k),
+        loop.run_in_executor(executor, tracing.bind(_similar_stage), feature_text),
+    )
+    reused = _reuse_result(feature_name, feature_text, similar) if reuse else None
+    if reused is not None:
+        return reused
+    combined_context, cat_ids, retrieval_sources = _combine_context(cat_parts, cat_ids, chunks)
+
+    cA, cB, aStrict, aRisk, path = await loop.run_in_executor(executor, tracing.bind(committee), feature_text, combined_context)
+    result = _build_result(feature_name, cat_ids, retrieval_sources, cA, cB, aStrict, aRisk, path)
+    result["similar_decisions"] = similar
+    # kept so a law added later in a named jurisdiction flags this decision for re-audit
+    result["jurisdictions"] = jurisdictions
+    return result
+
+def persist_result(row: dict, feature_desc: str = "", csv_path: str = "data/outputs.csv") -> int:
+    """
+    Append a run_once result to outputs.csv and the results store, and index its
+    embedding for similar-decision search. Returns the decision id.
+    """
+    from store.decision_index import get_decision_index, embed_feature
+    # the persist span is appended to row["trace"] after the row itself has been written
+    # kept in the stored record so run_batch.py --reaudit can re-run the feature later
+    row.setdefault("feature_description", feature_desc)
+    with tracing.trace(row.setdefault("trace", [])), tracing.span("persist"):
+        append_csv(row, csv_path=csv_path)
+        did = get_store().append(row)
+        get_decision_index().add(did, embed_feature(f"{row['feature_name']}\n{feature_desc}".strip()))
+    return did
+
+_CSV_HEADERS = [
+    "feature_name", "needs_geo_compliance", "confidence",
+    "catalog_rule_ids", "regulations", "classifier_A", "classifier_B",
+    "auditor_strict", "auditor_risk", "retrieval_sources",
+    "timestamp", "models", "embeddings"
+]
+
+def _csv_row(row: dict) -> dict:
+    return {
+        "feature_name": row["feature_name"],
+        "needs_geo_compliance": row["needs_geo_compliance"],
+        "confidence": row["confidence"],
+        "catalog_rule_ids": "|".join(row.get("catalog_rule_ids", [])),
+        "regulations": "|".join(row["regulations"]),
+        "classifier_A": json.dumps(row["classifier_A"], ensure_ascii=False),
+        "classifier_B": json.dumps(row["classifier_B"], ensure_ascii=False),
+        "auditor_strict": json.dumps(row["auditor_strict"], ensure_ascii=False),
+        "auditor_risk": json.dumps(row["auditor_risk"], ensure_ascii=False),
+        "retrieval_sources": json.dumps(row["retrieval_sources"], ensure_ascii=False),
+        "timestamp": row["timestamp"],
+        "models": json.dumps(row["models"], ensure_ascii=False),
+        "embeddings": row["embeddings"],
+    }
+
+def append_csv(row: dict, csv_path: str = "data/outputs.csv"):
+    # queued to the file's audit sink (store.audit_sink): the nested blobs are serialized and
+    # appended on its writer thread; store.audit_sink.flush_all() waits for the file to catch up
+    from store.audit_sink import get_sink
+    get_sink(csv_path, fmt="csv", fieldnames=_CSV_HEADERS, transform=_csv_row).append(row)
+
+
+def _catalog_context_for_feature(wants: list[str], max_laws_per_j=2, max_rules_per_law=2) -> tuple[list[str], list[str]]:
+    # wants: jurisdictions named in the feature (catalog.matcher), in order of mention
     by_j = laws_by_jurisdiction()
-    wants = _guess_jurisdictions(feature_text)
     parts, used_ids = [], []
     for j in wants:
         for law in by_j.get(j, [])[:max_laws_per_j]:
             for r in law.rules[:max_rules_per_law]:
                 parts.append(f"[CAT {j} {r.rule_id}] {r.title} — {r.text}")
                 used_ids.append(f"{j}:{r.rule_id}")
-    return ("\n\n".join(parts), used_ids)
-
-def _catalog_fallback_all_rules(feature_text: str, top_k: int = 4) -> tuple[str, list[str]]:
-    feats = set(w.strip(",.:;()[]").lower() for w in feature_text.split() if len(w) > 3)
-    scored = []
-    for j, rid, title, text in flat_rules_index():
-        kw = set(title.lower().split())
-        score = len(kw & feats)
-        if score:
-            scored.append((score, j, rid, title, text))
-    scored.sort(key=lambda x: x[0], reverse=True)
+    return parts, used_ids
+
+def _catalog_fallback_all_rules(feature_text: str, top_k: int = 4) -> tuple[list[str], list[str]]:
     parts, used_ids = [], []
-    for _, j, rid, title, text in scored[:top_k]:
+    for _, j, rid, title, text in search_rules(feature_text, top_k=top_k):
         parts.append(f"[CAT {j} {rid}] {title} — {text}")
         used_ids.append(f"{j}:{rid}")
-    return ("\n\n".join(parts), used_ids)
+    return parts, used_ids
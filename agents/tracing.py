@@ -0,0 +1,190 @@
+import os, re, sys, math, time, cProfile, resource, threading, contextvars, functools
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+# TRACE=0 turns every span into a no-op
+TRACE = os.environ.get("TRACE", "1") != "0"
+# when set, each run_once is profiled with cProfile and dumped to <dir>/<feature>.<ts>.prof
+# (open with snakeviz / pstats; use --workers 1 so features do not overlap)
+PROFILE_DIR = os.environ.get("TRACE_PROFILE_DIR", "")
+# span attributes summed across a batch by summarize()
+_SUMMED = ("prompt_tokens", "gen_tokens", "prefix_tokens", "prefill_ms", "decode_ms", "json_retries", "cache_hits", "llm_calls")
+
+
+class Trace:
+    """
+    Spans of one feature. Finished spans are appended as plain dicts:
+    {"name", "parent", "start" (epoch s), "ms", **attrs}; children land before their parent.
+    """
+
+    def __init__(self, spans: Optional[List[Dict]] = None):
+        self.spans = spans if spans is not None else []
+        self._lock = threading.Lock()
+
+    def add(self, rec: Dict) -> None:
+        with self._lock:
+            self.spans.append(rec)
+
+
+_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("trace", default=None)
+_span: "contextvars.ContextVar[Optional[Dict]]" = contextvars.ContextVar("span", default=None)
+
+
+@contextmanager
+def trace(spans: Optional[List[Dict]] = None):
+    """
+    Collect spans opened in this context (pass an existing list to keep appending to it).
+    """
+    tr = Trace(spans)
+    tok = _trace.set(tr)
+    try:
+        yield tr
+    finally:
+        _trace.reset(tok)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a block. No-op outside a trace or with TRACE=0. Yields the span dict, so
+    callers can attach attributes (token counts, batch size) while it is open.
+    """
+    tr = _trace.get()
+    if tr is None or not TRACE:
+        yield None
+        return
+    parent = _span.get()
+    rec = {"name": name, "parent": parent["name"] if parent else None, "start": round(time.time(), 3)}
+    rec.update(attrs)
+    tok = _span.set(rec)
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    except BaseException as e:
+        rec["error"] = type(e).__name__
+        raise
+    finally:
+        rec["ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+        _span.reset(tok)
+        tr.add(rec)
+
+
+def traced(name: str):
+    """
+    Decorator form of span() for whole pipeline stages.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def annotate(**attrs) -> None:
+    # set attributes on the innermost open span
+    rec = _span.get()
+    if rec is not None:
+        rec.update(attrs)
+
+
+def incr(key: str, n: float = 1) -> None:
+    # add to a counter on the innermost open span
+    rec = _span.get()
+    if rec is not None:
+        rec[key] = rec.get(key, 0) + n
+
+
+def adopt(spans: Iterable[Dict]) -> None:
+    """
+    Add spans recorded in another thread's trace (e.g. a shared batch run on behalf
+    of several features) to the current one, under the innermost open span.
+    """
+    tr = _trace.get()
+    if tr is None or not TRACE:
+        return
+    parent = _span.get()
+    for rec in spans:
+        rec = dict(rec)
+        if rec.get("parent") is None:
+            rec["parent"] = parent["name"] if parent else None
+        tr.add(rec)
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    fn wrapped to run in a copy of the current context, for executor threads
+    (run_in_executor does not carry contextvars over).
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
+
+
+_profiling = threading.local()
+
+
+@contextmanager
+def profiled(label: str):
+    # one profiler per thread: async features interleaved on the event loop thread are
+    # recorded in the profile of whichever one started first
+    if not PROFILE_DIR or getattr(_profiling, "active", False):
+        yield
+        return
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    prof = cProfile.Profile()
+    _profiling.active = True
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        _profiling.active = False
+        safe = re.sub(r"[^A-Za-z0-9._-]+", "_", label)[:80] or "feature"
+        prof.dump_stats(os.path.join(PROFILE_DIR, f"{safe}.{int(time.time() * 1000)}.prof"))
+
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of an ascending list (0.0 when empty).
+    """
+    if not sorted_vals:
+        return 0.0
+    return sorted_vals[max(0, math.ceil(p / 100.0 * len(sorted_vals)) - 1)]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return r / (1024 * 1024) if sys.platform == "darwin" else r / 1024
+
+
+def summarize(traces: Iterable[List[Dict]]) -> Dict[str, Dict]:
+    """
+    Per span name across many traces: count, mean/p50/p95/p99/max ms, and totals of
+    token/retry attributes. Spans repeated within one trace are counted separately;
+    attributes of a span shared by a micro-batch (shared_by) are split between its callers.
+    """
+    by_name: Dict[str, List[Dict]] = {}
+    for spans in traces:
+        for rec in spans or []:
+            by_name.setdefault(rec["name"], []).append(rec)
+    out = {}
+    for name, recs in sorted(by_name.items()):
+        ms = sorted(r["ms"] for r in recs)
+        row = {
+            "count": len(ms),
+            "mean_ms": round(sum(ms) / len(ms), 3),
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "max_ms": ms[-1],
+            "total_ms": round(sum(ms), 3),
+        }
+        for key in _SUMMED:
+            # a batched span adopted by each of its shared_by callers counts 1/shared_by per caller,
+            # so the totals match the batch once instead of once per caller
+            vals = [r[key] / r.get("shared_by", 1) for r in recs if isinstance(r.get(key), (int, float))]
+            if vals:
+                row[key] = round(sum(vals), 3)
+        out[name] = row
+    return out
@@ -0,0 +1,69 @@
+import json, os, time
+from typing import Dict, Iterable, Optional, Tuple
+
+CHANGES_LOG = os.environ.get("CATALOG_CHANGES", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "catalog_changes.jsonl"))
+
+
+def _rule_sig(r: Dict) -> Tuple:
+    # what the prompts and the catalog BM25 index see of a rule
+    return (r.get("title"), r.get("section"), r.get("text"), tuple(r.get("keywords") or []))
+
+
+def diff_law(prev: Optional[Dict], new: Dict) -> Optional[Dict]:
+    """
+    Change entry for one law artifact, or None if nothing a decision could have used
+    changed. Rule ids are "J:rule_id", as in run_once's catalog_rule_ids.
+    """
+    j_new = (new.get("jurisdiction") or "TBD").strip()
+    new_rules = {f"{j_new}:{r['rule_id']}": _rule_sig(r) for r in new.get("rules", [])}
+    if prev is None:
+        # a new law can displace older ones from the per-jurisdiction catalog context
+        return {"md_file": new.get("md_file"), "action": "added", "rules": sorted(new_rules), "jurisdictions": [j_new]}
+    j_old = (prev.get("jurisdiction") or "TBD").strip()
+    old_rules = {f"{j_old}:{r['rule_id']}": _rule_sig(r) for r in prev.get("rules", [])}
+    changed = sorted(rid for rid in set(old_rules) | set(new_rules) if old_rules.get(rid) != new_rules.get(rid))
+    if not changed:
+        return None
+    return {
+        "md_file": new.get("md_file"),
+        "action": "changed",
+        "rules": changed,
+        "jurisdictions": sorted({j_old, j_new}) if j_old != j_new else [],
+    }
+
+
+def record_changes(entries: Iterable[Dict], path: str = CHANGES_LOG) -> int:
+    """
+    Append change entries (from diff_law) to the log with the current time.
+    """
+    now = time.time()
+    n = 0
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for e in entries:
+            f.write(json.dumps(dict(e, ts=now), ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def changes_since(since: float, path: str = CHANGES_LOG) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    ({rule_id: last changed_at}, {jurisdiction: last changed_at}) for entries at or after `since`.
+    """
+    rules: Dict[str, float] = {}
+    jurisdictions: Dict[str, float] = {}
+    if not os.path.exists(path):
+        return rules, jurisdictions
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            e = json.loads(line)
+            ts = float(e.get("ts") or 0)
+            if ts < since:
+                continue
+            for rid in e.get("rules", []):
+                rules[rid] = max(ts, rules.get(rid, 0.0))
+            for j in e.get("jurisdictions", []):
+                jurisdictions[j] = max(ts, jurisdictions.get(j, 0.0))
+    return rules, jurisdictions
@@ -1,30 +1,82 @@
-import json, os
+import json, os, threading
 from typing import Dict, List, Tuple
 from catalog.schema import LawArtifact
+from rag.bm25 import BM25Index
 
-CATALOG_JSON = os.path.join(os.path.dirname(os.path.dirname(__file__)), "files", "main", "directory.json")
+CATALOG_JSON = os.environ.get("CATALOG_JSON", os.path.join(os.path.dirname(os.path.dirname(__file__)), "files", "main", "directory.json"))
 
-def _load() -> List[dict]:
-    if not os.path.exists(CATALOG_JSON):
+def _load(path: str = CATALOG_JSON) -> List[dict]:
+    if not os.path.exists(path):
         return []
-    with open(CATALOG_JSON, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f) or []
+        except json.JSONDecodeError:
+            # empty or half-written catalog: behave as if there were no laws yet
+            return []
+
+
+class Catalog:
+    """
+    Parsed catalog plus a BM25 inverted index over rule titles, keywords and text.
+    """
+
+    def __init__(self, items: List[dict]):
+        self.by_jurisdiction: Dict[str, List[LawArtifact]] = {}
+        for item in items:
+            j = (item.get("jurisdiction") or "TBD").strip()
+            self.by_jurisdiction.setdefault(j, []).append(LawArtifact(**item))
+        # (jurisdiction, rule_id, title, text)
+        self.rules: List[Tuple[str, str, str, str]] = []
+        docs: List[str] = []
+        for j, laws in self.by_jurisdiction.items():
+            for law in laws:
+                for r in law.rules:
+                    title, text = r.title or "", r.text or ""
+                    self.rules.append((j, r.rule_id, title, text))
+                    # titles and keywords are short but precise, so weight them above body text
+                    kw = " ".join(r.keywords or [])
+                    docs.append(" ".join([title, title, kw, kw, text]))
+        self.index = BM25Index(docs)
+
+    def search_rules(self, query: str, top_k: int = 4) -> List[Tuple[float, str, str, str, str]]:
+        """
+        [(score, jurisdiction, rule_id, title, text)] best first.
+        """
+        return [(score,) + self.rules[i] for i, score in self.index.search(query, top_k=top_k)]
+
+
+_lock = threading.Lock()
+_catalog = None
+_catalog_sig = None
+
+def _signature(path: str) -> tuple:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_mtime_ns, st.st_size)
+
+def get_catalog(path: str = CATALOG_JSON) -> Catalog:
+    """
+    Process-wide catalog, re-parsed only when directory.json changes on disk.
+    """
+    global _catalog, _catalog_sig
+    sig = _signature(path)
+    with _lock:
+        if _catalog is None or _catalog_sig != sig:
+            _catalog = Catalog(_load(path))
+            _catalog_sig = sig
+        return _catalog
 
 def laws_by_jurisdiction() -> Dict[str, List[LawArtifact]]:
-    data = _load()
-    mapping: Dict[str, List[LawArtifact]] = {}
-    for item in data:
-        j = (item.get("jurisdiction") or "TBD").strip()
-        mapping.setdefault(j, []).append(LawArtifact(**item))
-    return mapping
+    return dict(get_catalog().by_jurisdiction)
 
 def flat_rules_index() -> List[Tuple[str, str, str, str]]:
     """
     (jurisdiction, rule_id, title, text) for fallback searches with no jurisdiction.
     """
-    out: List[Tuple[str, str, str, str]] = []
-    for j, laws in laws_by_jurisdiction().items():
-        for law in laws:
-            for r in law.rules:
-                out.append((j, r.rule_id, r.title or "", r.text or ""))
-    return out
+    return list(get_catalog().rules)
+
+def search_rules(query: str, top_k: int = 4) -> List[Tuple[float, str, str, str, str]]:
+    return get_catalog().search_rules(query, top_k=top_k)
@@ -1,5 +1,7 @@
-import json
-from llm.local_llm import generate_json
+import json, os, re, time
+from collections import Counter
+from typing import Dict, List
+from llm.local_llm import generate_json_batch
 # expand the schema the extractor asks for
 EXTRACTOR_SYS = (
     "You are a legal text structurer. Given markdown of a law, "
@@ -7,6 +9,19 @@ EXTRACTOR_SYS = (
     "Rules capture key obligations by article/section. Keep rule text 100–400 words."
 )
 
+# laws are split on section/article boundaries and packed into chunks of at most this many chars
+CHUNK_CHARS = int(os.environ.get("EXTRACT_CHUNK_CHARS", "6000"))
+# chunks generated together in one batched forward pass
+EXTRACT_BATCH = int(os.environ.get("EXTRACT_BATCH", "4"))
+
+_BOUNDARY_RE = re.compile(
+    r"^(?:#{1,6}\s"                                                          # markdown headings
+    r"|\s*(?:Article|ARTICLE|Art\.|Section|SECTION|Sec\.|§|Chapter|CHAPTER)\s*[0-9IVXLC]"
+    r"|\d{2,}\.\d+[A-Za-z]?\s"                                                # statute numbers, e.g. 501.1736
+    r"|\([a-z]\)\s+[A-Z][A-Z ,]{3,}[.—])",                                     # "(a) DUTY TO REPORT.—"
+    re.M,
+)
+
 def _schema_example():
     return {
       "jurisdiction": "e.g., 'EU', 'US-Federal', 'US-Utah', 'US-Florida', 'US-California'",
@@ -27,15 +42,126 @@ def _schema_example():
       ]
     }
 
-def extract_struct(md_text: str) -> dict:
-    user = (
-        "MARKDOWN LAW TEXT:\n" + md_text[:20000] +  # safety truncation
+def split_sections(md_text: str) -> List[str]:
+    """
+    Split markdown at headings and Article/Section/§/Chapter lines.
+    """
+    starts = sorted(set([0] + [m.start() for m in _BOUNDARY_RE.finditer(md_text)]))
+    starts.append(len(md_text))
+    return [md_text[a:b] for a, b in zip(starts, starts[1:]) if md_text[a:b].strip()]
+
+def pack_chunks(sections: List[str], max_chars: int = CHUNK_CHARS) -> List[str]:
+    """
+    Greedily pack consecutive sections into chunks of at most max_chars.
+    Oversized sections are split on paragraphs, then hard-split.
+    """
+    pieces: List[str] = []
+    for sec in sections:
+        if len(sec) <= max_chars:
+            pieces.append(sec)
+            continue
+        for para in re.split(r"(?<=\n\n)(?=[^\n])", sec):
+            while len(para) > max_chars:
+                pieces.append(para[:max_chars])
+                para = para[max_chars:]
+            if para.strip():
+                pieces.append(para)
+    chunks: List[str] = []
+    cur = ""
+    for p in pieces:
+        if cur and len(cur) + len(p) > max_chars:
+            chunks.append(cur)
+            cur = ""
+        cur += p
+    if cur.strip():
+        chunks.append(cur)
+    return chunks
+
+def _chunk_user(chunk: str, i: int, n: int) -> str:
+    return (
+        f"MARKDOWN LAW TEXT (part {i} of {n}; extract rules from this part only):\n" + chunk +
         "\n\nReturn ONLY valid JSON with this shape (no prose):\n" +
         json.dumps(_schema_example(), indent=2)
     )
-    out = generate_json(EXTRACTOR_SYS, user, temperature=0.0, max_new_tokens=1200).strip()
+
+def _parse(out: str) -> dict:
+    out = out.strip()
     if out.startswith("```"):
         out = out.strip("`")
         if "\n" in out:
             out = out.split("\n", 1)[1]
-    return json.loads(out)
+    start = out.find("{")
+    return json.JSONDecoder().raw_decode(out[start if start >= 0 else 0:])[0]
+
+def _vote(values: List[str]) -> str:
+    vals = [v.strip() for v in values if isinstance(v, str) and v.strip() and not v.strip().lower().startswith(("tbd", "e.g"))]
+    return Counter(vals).most_common(1)[0][0] if vals else "TBD"
+
+def _merge(partials: List[dict]) -> dict:
+    """
+    Reduce per-chunk extractions: majority jurisdiction/area, union of identifiers,
+    rules deduplicated by rule_id (longest text wins, keywords/citations unioned).
+    """
+    idents: List[str] = []
+    rules: Dict[str, dict] = {}
+    for part in partials:
+        for ident in part.get("law_identifiers") or []:
+            if isinstance(ident, str) and ident not in idents:
+                idents.append(ident)
+        for r in part.get("rules") or []:
+            if not isinstance(r, dict):
+                continue
+            rid = (r.get("rule_id") or "").strip()
+            key = rid.lower() or f"_anon{len(rules)}"
+            prev = rules.get(key)
+            if prev is None:
+                rules[key] = dict(r)
+                continue
+            if len(r.get("text") or "") > len(prev.get("text") or ""):
+                merged = dict(r)
+            else:
+                merged = prev
+            for field in ("keywords", "citations"):
+                merged[field] = list(dict.fromkeys((prev.get(field) or []) + (r.get(field) or [])))
+            rules[key] = merged
+    return {
+        "jurisdiction": _vote([p.get("jurisdiction") for p in partials]),
+        "regulatory_area": _vote([p.get("regulatory_area") for p in partials]),
+        "law_identifiers": idents,
+        "rules": list(rules.values()),
+    }
+
+def extract_struct(md_text: str, chunk_chars: int = CHUNK_CHARS, batch_size: int = EXTRACT_BATCH) -> dict:
+    """
+    Map-reduce extraction: split the law into section-aligned chunks, extract rules
+    per chunk (batched through the model), then merge. Covers the whole text
+    instead of a fixed prefix. Per-chunk timings are returned under chunk_timings.
+    """
+    chunks = pack_chunks(split_sections(md_text), chunk_chars)
+    n = len(chunks)
+    partials: List[dict] = []
+    timings: List[dict] = []
+    for b in range(0, n, max(1, batch_size)):
+        batch = chunks[b:b + max(1, batch_size)]
+        t0 = time.perf_counter()
+        outs = generate_json_batch([
+            (EXTRACTOR_SYS, _chunk_user(c, b + j + 1, n), {"temperature": 0.0, "max_new_tokens": 1200})
+            for j, c in enumerate(batch)
+        ])
+        # chunks in a batch share one forward pass, so they share its wall time
+        per_chunk = (time.perf_counter() - t0) / len(batch)
+        for j, (c, out) in enumerate(zip(batch, outs)):
+            info = {"chunk": b + j + 1, "chars": len(c), "seconds": round(per_chunk, 2), "ok": True, "rules": 0}
+            try:
+                part = _parse(out)
+                partials.append(part)
+                info["rules"] = len(part.get("rules") or [])
+            except Exception:
+                info["ok"] = False
+            timings.append(info)
+            print(f"   chunk {info['chunk']}/{n}: {info['chars']} chars, {info['rules']} rules, {info['seconds']}s" + ("" if info["ok"] else " (invalid JSON)"))
+    if n and not partials:
+        raise ValueError(f"no valid JSON from any of {n} chunks")
+    struct = _merge(partials)
+    struct["chunk_timings"] = timings
+    return struct
@@ -0,0 +1,127 @@
+import csv, os, re, threading
+from typing import Dict, List, Optional, Tuple
+from catalog.dir_load import _signature, get_catalog
+
+GLOSSARY_CSV = os.environ.get("GLOSSARY_CSV", os.path.join(os.path.dirname(os.path.dirname(__file__)), "files", "main", "glossary.csv"))
+
+# hyphens split tokens ("US-Utah" -> US, Utah); dots stay inside them ("U.S.C", "2258a.1")
+_TOKEN_RE = re.compile(r"§|[A-Za-z0-9]+(?:\.[A-Za-z0-9]+)*")
+
+# surface forms of the jurisdictions the prompts and catalog use, on top of whatever
+# jurisdiction names and law identifiers the catalog itself contains
+_ALIASES: Dict[str, List[str]] = {
+    "EU": ["EU", "EEA", "European Union", "Europe", "European Economic Area"],
+    "US-Utah": ["Utah"],
+    "US-Florida": ["Florida"],
+    "US-California": ["California", "CA"],
+    "US-Federal": ["NCMEC", "federal", "18 U.S.C", "US Code", "US federal"],
+}
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text or "")
+
+
+def _is_acronym(term: str) -> bool:
+    # short all-caps forms ("EU", "CA") are ordinary words in lower case, so match them exactly
+    return len(term) <= 3 and term.isupper()
+
+
+def load_glossary(path: str = GLOSSARY_CSV) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return {(r.get("term") or "").strip(): (r.get("explanation") or "").strip() for r in csv.DictReader(f) if (r.get("term") or "").strip()}
+
+
+class Matcher:
+    """
+    Token trie over jurisdiction names and aliases, law identifiers and glossary
+    terms. match() walks the feature text once, trying the trie from every token,
+    so cost grows with text length (times the longest pattern) and not with the
+    number of patterns. Glossary terms and short acronyms are case-sensitive
+    ("CA", "GH" but not "ca", "gh"); everything else is not.
+    """
+
+    def __init__(self, laws_by_jurisdiction: Dict[str, list], glossary: Dict[str, str]):
+        self.glossary = glossary
+        # trie node: {lower token: child node}; payloads under the "" key:
+        # [(kind, value, exact token tuple or None)]
+        self.root: Dict = {}
+        self.max_len = 0
+        for j, forms in _ALIASES.items():
+            for form in forms:
+                self._add(form, ("jurisdiction", j), _is_acronym(form))
+        for j, laws in laws_by_jurisdiction.items():
+            if j == "TBD":
+                continue
+            self._add(j, ("jurisdiction", j), _is_acronym(j))
+            for law in laws:
+                for ident in law.law_identifiers or []:
+                    self._add(ident, ("statute", ident), False)
+                    self._add(ident, ("jurisdiction", j), False)
+        for term in glossary:
+            self._add(term, ("glossary", term), True)
+
+    def _add(self, surface: str, payload: Tuple[str, str], case_sensitive: bool) -> None:
+        toks = _tokens(surface)
+        if not toks:
+            return
+        node = self.root
+        for t in toks:
+            node = node.setdefault(t.lower(), {})
+        node.setdefault("", []).append(payload + (tuple(toks) if case_sensitive else None,))
+        self.max_len = max(self.max_len, len(toks))
+
+    def match(self, text: str) -> Dict[str, List]:
+        """
+        {"jurisdictions": [...], "statutes": [...], "glossary": [(term, explanation)]},
+        each in order of first mention.
+        """
+        toks = _tokens(text)
+        low = [t.lower() for t in toks]
+        found: Dict[str, Dict[str, None]] = {"jurisdiction": {}, "statute": {}, "glossary": {}}
+        for i in range(len(toks)):
+            node = self.root
+            for j in range(i, min(len(toks), i + self.max_len)):
+                node = node.get(low[j])
+                if node is None:
+                    break
+                for kind, value, exact in node.get("", ()):
+                    if exact is None or tuple(toks[i:j + 1]) == exact:
+                        found[kind][value] = None
+        return {
+            "jurisdictions": list(found["jurisdiction"]),
+            "statutes": list(found["statute"]),
+            "glossary": [(t, self.glossary[t]) for t in found["glossary"]],
+        }
+
+    def expand_query(self, text: str, match: Optional[Dict[str, List]] = None) -> str:
+        """
+        text followed by the explanations of the internal terms it uses, so lexical
+        and dense retrieval see "personalized feed" where the feature says "PF".
+        """
+        m = match if match is not None else self.match(text)
+        if not m["glossary"]:
+            return text
+        return text + "\n" + "\n".join(f"{t}: {e}" for t, e in m["glossary"])
+
+
+_lock = threading.Lock()
+_matcher: Optional[Matcher] = None
+_matcher_sig = None
+
+
+def get_matcher(glossary_path: str = GLOSSARY_CSV) -> Matcher:
+    """
+    Process-wide matcher, rebuilt only when directory.json or the glossary changes.
+    """
+    global _matcher, _matcher_sig
+    catalog = get_catalog()
+    # get_catalog() hands out a new object whenever directory.json changed
+    sig = (catalog, _signature(glossary_path))
+    with _lock:
+        if _matcher is None or _matcher_sig != sig:
+            _matcher = Matcher(catalog.by_jurisdiction, load_glossary(glossary_path))
+            _matcher_sig = sig
+        return _matcher
@@ -18,4 +18,6 @@ class LawArtifact(BaseModel):
     regulatory_area: str
     jurisdiction: str
     law_identifiers: List[str] = []        # NEW e.g. "DSA Art. 16", "18 U.S.C. § 2258A"
+    md_sha256: Optional[str] = None        # content hashes used by tools.update_cat to skip unchanged laws
+    pdf_sha256: Optional[str] = None
     rules: List[Rule] = []
\ No newline at end of file
@@ -0,0 +1,81 @@
+import os, sys, json, time, argparse
+import numpy as np
+
+# allow `python evaluation/bench_vector_store.py` from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from rag.flat_store import FLAT_DIR, FlatStore
+from agents.tracing import peak_rss_mb
+
+
+def _queries(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    q = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+def _latency(fn, queries: np.ndarray) -> dict:
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - t0)
+    times = np.asarray(times) * 1000
+    return {"p50_ms": float(np.percentile(times, 50)), "p95_ms": float(np.percentile(times, 95)), "mean_ms": float(times.mean())}
+
+
+def bench_flat(persist_dir: str, n_queries: int, k: int) -> dict:
+    rss0 = peak_rss_mb()
+    t0 = time.perf_counter()
+    store = FlatStore(os.path.join(persist_dir, FLAT_DIR))
+    load_s = time.perf_counter() - t0
+    queries = _queries(n_queries, store.meta["dim"])
+    latency = _latency(lambda q: store.search(q, k), queries)
+    t0 = time.perf_counter()
+    store.search(queries, k)
+    batch_s = time.perf_counter() - t0
+    return {
+        "rows": len(store), "dtype": store.meta["dtype"], "load_s": load_s,
+        "query": latency, "batch_query_s": batch_s, "rss_delta_mb": peak_rss_mb() - rss0,
+    }
+
+
+def bench_llama(persist_dir: str, n_queries: int, k: int) -> dict:
+    from llama_index.core import load_index_from_storage, StorageContext
+    from llama_index.core.vector_stores.types import VectorStoreQuery
+    from rag.retriever import get_embed_model
+    get_embed_model()  # model load is not part of the index load time
+    rss0 = peak_rss_mb()
+    t0 = time.perf_counter()
+    index = load_index_from_storage(StorageContext.from_defaults(persist_dir=persist_dir), embed_model=get_embed_model())
+    load_s = time.perf_counter() - t0
+    emb = index.vector_store.data.embedding_dict
+    dim = len(next(iter(emb.values()))) if emb else 0
+    queries = _queries(n_queries, dim)
+    vs = index.vector_store
+    return {
+        "rows": len(emb), "load_s": load_s,
+        "query": _latency(lambda q: vs.query(VectorStoreQuery(query_embedding=q.tolist(), similarity_top_k=k)), queries),
+        "rss_delta_mb": peak_rss_mb() - rss0,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compare the llama-index JSON store with the memory-mapped flat store.")
+    ap.add_argument("--persist-dir", default=os.path.join(PROJECT_ROOT, "rag_index"))
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--backend", choices=["both", "flat", "llama"], default="both",
+                    help="run one side only, e.g. to measure RSS in a fresh process")
+    args = ap.parse_args()
+
+    report = {"persist_dir": args.persist_dir, "queries": args.queries, "k": args.k}
+    # flat first: it maps files lazily, so running it before llama keeps its RSS figure honest
+    if args.backend in ("both", "flat"):
+        report["flat"] = bench_flat(args.persist_dir, args.queries, args.k)
+    if args.backend in ("both", "llama"):
+        report["llama"] = bench_llama(args.persist_dir, args.queries, args.k)
+    if "flat" in report and "llama" in report and report["flat"]["load_s"] > 0:
+        report["load_speedup"] = report["llama"]["load_s"] / report["flat"]["load_s"]
+    print(json.dumps(report, indent=2))
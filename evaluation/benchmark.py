@@ -0,0 +1,273 @@
+import os, sys, csv, json, time, random, shutil, argparse, tempfile, itertools
+from typing import Callable, Dict, Iterable, List, Optional
+
+# allow `python evaluation/benchmark.py` from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from agents.tracing import peak_rss_mb, percentile
+
+DEFAULT_INPUT = os.path.join(PROJECT_ROOT, "data", "sample_data.csv")
+# columns accepted as the ground-truth label in --labels files or the input itself
+LABEL_COLUMNS = ("label", "needs_geo_compliance", "expected")
+
+# jurisdictions and cue phrases mixed into synthetic features and laws
+_REGIONS = ["EU", "US-Utah", "US-Florida", "US-California", "US-Federal", "Brazil", "India", "Japan", "Canada", "Korea"]
+_PLACES = ["the EU", "Utah", "Florida", "California", "the US", "Brazil", "India", "Japan", "Canada", "Korea", "all markets"]
+_TOPICS = ["minor safety", "data retention", "content moderation", "age assurance", "personalization",
+           "ad targeting", "reporting obligations", "parental consent", "transparency", "recommender systems"]
+
+
+def _read_rows(path: str) -> List[Dict[str, str]]:
+    # every column is kept so a label column can be picked up
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def _as_bool(v) -> Optional[bool]:
+    if isinstance(v, bool):
+        return v
+    s = str(v if v is not None else "").strip().lower()
+    if s in ("1", "true", "yes", "y"):
+        return True
+    if s in ("0", "false", "no", "n"):
+        return False
+    return None
+
+
+def load_labels(rows: List[Dict], labels_path: Optional[str]) -> Dict[str, bool]:
+    """
+    feature_name -> expected needs_geo_compliance, from --labels or a label column
+    of the input. Rows without a usable label are left out; nothing is inferred.
+    """
+    src = _read_rows(labels_path) if labels_path else rows
+    out = {}
+    for r in src:
+        for col in LABEL_COLUMNS:
+            v = _as_bool(r.get(col))
+            if v is not None:
+                out[(r.get("feature_name") or "").strip()] = v
+                break
+    return out
+
+
+def synth_features(base: List[Dict[str, str]], n: int, seed: int = 0) -> List[Dict[str, str]]:
+    """
+    n features derived from the base rows, each with a distinct name and a perturbed
+    description. Deterministic for a given seed; synthetic rows carry no labels.
+    """
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        b = base[i % len(base)]
+        place, topic = rng.choice(_PLACES), rng.choice(_TOPICS)
+        out.append({
+            "feature_name": f"{b['feature_name']} #{i}",
+            "feature_description": f"{b['feature_description']} Variant {i}: staged rollout in {place}, reviewed for {topic}.",
+        })
+    return out
+
+
+def synth_catalog(n_laws: int, seed: int = 0, rules_per_law: int = 5) -> List[Dict]:
+    """
+    n_laws LawArtifact dicts spread over a fixed set of jurisdictions.
+    """
+    rng = random.Random(seed)
+    laws = []
+    for i in range(n_laws):
+        j = _REGIONS[i % len(_REGIONS)]
+        topic = rng.choice(_TOPICS)
+        rules = []
+        for r in range(rules_per_law):
+            kw = rng.sample(_TOPICS, 2)
+            rules.append({
+                "rule_id": f"R{r + 1}",
+                "title": f"{topic.title()} duty {r + 1}",
+                "section": f"§ {100 + r}",
+                "text": f"Providers offering services in {j} shall ensure {kw[0]} and {kw[1]} controls for users under 18 (synthetic law {i}).",
+                "keywords": kw,
+                "citations": [f"SYN-{i} § {100 + r}"],
+            })
+        laws.append({
+            "filename": f"synthetic_{i}.pdf", "original_file": f"synthetic_{i}.pdf", "md_file": f"synthetic_{i}.md",
+            "title": f"Synthetic {j} {topic} act {i}", "regulatory_area": topic, "jurisdiction": j,
+            "law_identifiers": [f"SYN-{i}"], "rules": rules,
+        })
+    return laws
+
+
+def measure(fn: Callable, items: Iterable) -> Dict:
+    """
+    Call fn(item) for every item; latency percentiles, throughput and peak RSS.
+    """
+    lat, errors = [], 0
+    t0 = time.perf_counter()
+    for it in items:
+        t = time.perf_counter()
+        try:
+            fn(it)
+        except Exception:
+            errors += 1
+        lat.append((time.perf_counter() - t) * 1000.0)
+    total = time.perf_counter() - t0
+    lat.sort()
+    return {
+        "n": len(lat),
+        "errors": errors,
+        "total_s": round(total, 3),
+        "throughput_per_s": round(len(lat) / total, 3) if total > 0 else 0.0,
+        "p50_ms": round(percentile(lat, 50), 3),
+        "p95_ms": round(percentile(lat, 95), 3),
+        "mean_ms": round(sum(lat) / len(lat), 3) if lat else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def accuracy(results: Dict[str, bool], labels: Dict[str, bool]) -> Optional[Dict]:
+    pairs = [(results[n], y) for n, y in labels.items() if n in results]
+    if not pairs:
+        return None
+    tp = sum(1 for p, y in pairs if p and y)
+    fp = sum(1 for p, y in pairs if p and not y)
+    fn = sum(1 for p, y in pairs if not p and y)
+    tn = len(pairs) - tp - fp - fn
+    prec = tp / (tp + fp) if tp + fp else 0.0
+    rec = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "n": len(pairs), "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "accuracy": round((tp + tn) / len(pairs), 4),
+        "precision": round(prec, 4),
+        "recall": round(rec, 4),
+        "f1": round(2 * prec * rec / (prec + rec), 4) if prec + rec else 0.0,
+    }
+
+
+def run_scale(features: List[Dict[str, str]], labels: Dict[str, bool], workdir: str, k: int, sample: Optional[int]) -> Dict:
+    from agents import runners
+    from store.results import get_store
+    from store.audit_sink import flush_all
+    from main import similar_features_by_reg
+
+    heavy = features[:sample] if sample else features
+    stages = {}
+    stages["catalog"] = measure(lambda r: runners._catalog_stage(f"{r['feature_name']}\n{r['feature_description']}"), features)
+    stages["retrieval"] = measure(lambda r: runners._retrieval_stage(f"{r['feature_name']}\n{r['feature_description']}", k), heavy)
+
+    results: List[Dict] = []
+    stages["run_once"] = measure(lambda r: results.append(runners.run_once(r["feature_name"], r["feature_description"], k=k)), heavy)
+
+    csv_path = os.path.join(workdir, f"outputs_{len(features)}.csv")
+    stages["append_csv"] = measure(lambda res: runners.append_csv(res, csv_path=csv_path), results)
+    # append_csv only queues; include the audit sink catching up
+    t = time.perf_counter()
+    flush_all()
+    stages["append_csv"]["flush_s"] = round(time.perf_counter() - t, 3)
+    get_store().append_many(results)
+    stages["similar_features_by_reg"] = measure(lambda res: similar_features_by_reg(regs=res["regulations"]), results)
+
+    predicted = {res["feature_name"]: bool(res["needs_geo_compliance"]) for res in results}
+    return {
+        "features": len(features),
+        "run_once_features": len(heavy),
+        "reused": sum(1 for res in results if res.get("reused_from")),
+        "stages": stages,
+        # only rows with a real label count; synthetic variants have none
+        "accuracy": accuracy(predicted, labels),
+    }
+
+
+def reuse_check(row: Dict[str, str], workdir: str, k: int, n: int = 3) -> Dict:
+    """
+    Submit one feature n times through run_once + persist_result, as repeated CI runs
+    do. With verdict reuse on, only the first submission should run the committee.
+    """
+    from agents import runners
+    csv_path = os.path.join(workdir, "outputs_reuse_check.csv")
+    committee_runs = 0
+    for _ in range(n):
+        res = runners.run_once(row["feature_name"], row["feature_description"], k=k)
+        committee_runs += 0 if res.get("reused_from") else 1
+        runners.persist_result(res, row["feature_description"], csv_path=csv_path)
+    return {"submissions": n, "committee_runs": committee_runs, "ok": committee_runs == 1}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="End-to-end pipeline benchmark (JSON report on stdout)")
+    ap.add_argument("--input", default=DEFAULT_INPUT, help="CSV or JSONL with feature_name, feature_description[, label]")
+    ap.add_argument("--labels", default=None, help="CSV/JSONL with feature_name and label / needs_geo_compliance / expected")
+    ap.add_argument("--features", default="0", help="comma-separated feature counts; 0 = the input as-is (e.g. 0,1000,10000,100000)")
+    ap.add_argument("--laws", default="0", help="comma-separated synthetic catalog sizes; 0 = the real catalog (e.g. 10,100,1000)")
+    ap.add_argument("--llm", choices=["stub", "real"], default="stub", help="stub: deterministic offline backend; real: LLM_BACKEND as configured")
+    ap.add_argument("--sample", type=int, default=None, help="cap features sent through retrieval/run_once per scale")
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--allow-reuse", action="store_true", help="keep the near-duplicate verdict reuse fast path on")
+    ap.add_argument("--out", default=None, help="also write the report to this file")
+    args = ap.parse_args()
+
+    # everything the run writes goes to a scratch dir; env must be set before the pipeline is imported
+    workdir = tempfile.mkdtemp(prefix="geo_bench_")
+    if args.llm == "stub":
+        os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_CACHE"] = "0"
+    os.environ["RESULTS_DB"] = os.path.join(workdir, "results.sqlite")
+    os.environ["DECISION_INDEX_DIR"] = os.path.join(workdir, "decision_index")
+    os.environ["EMBED_CACHE_DIR"] = os.path.join(workdir, "embed_cache")
+    if not args.allow_reuse:
+        os.environ["DECISION_REUSE_SIM"] = "2"  # cosine never reaches 2: always run the committee
+    laws_sizes = [int(x) for x in args.laws.split(",") if x.strip()]
+    real_catalog = os.environ.get("CATALOG_JSON", os.path.join(PROJECT_ROOT, "files", "main", "directory.json"))
+    if any(laws_sizes):
+        os.environ["CATALOG_JSON"] = os.path.join(workdir, "directory.json")
+    os.chdir(PROJECT_ROOT)  # rag_index and data/ are resolved relative to the project
+
+    base = _read_rows(args.input)
+    base = [{**r, "feature_name": (r.get("feature_name") or "").strip(), "feature_description": (r.get("feature_description") or "").strip()} for r in base]
+    labels = load_labels(base, args.labels)
+
+    from agents.runners import warm
+    t0 = time.perf_counter()
+    warm(k=args.k)
+    report = {
+        "config": {
+            "input": args.input, "llm": os.environ.get("LLM_BACKEND", "transformers"), "k": args.k,
+            "seed": args.seed, "sample": args.sample, "allow_reuse": args.allow_reuse,
+            "labeled_rows": len(labels), "workdir": workdir,
+        },
+        "warm_s": round(time.perf_counter() - t0, 3),
+        "runs": [],
+    }
+    if args.allow_reuse and base:
+        report["reuse_check"] = reuse_check(base[0], workdir, args.k)
+    for n_feat, n_laws in itertools.product([int(x) for x in args.features.split(",") if x.strip()], laws_sizes):
+        if any(laws_sizes):
+            tmp = os.environ["CATALOG_JSON"] + ".tmp"
+            if n_laws:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(synth_catalog(n_laws, seed=args.seed), f)
+            else:
+                shutil.copyfile(real_catalog, tmp)
+            os.replace(tmp, os.environ["CATALOG_JSON"])  # get_catalog reloads on the new signature
+        features = synth_features(base, n_feat, seed=args.seed) if n_feat else base
+        run = run_scale(features, labels, workdir, args.k, args.sample)
+        run["laws"] = n_laws or "real"
+        report["runs"].append(run)
+        print(f"features={run['features']} laws={run['laws']} run_once p50={run['stages']['run_once']['p50_ms']}ms", file=sys.stderr)
+    report["peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+    if not report.get("reuse_check", {}).get("ok", True):
+        print(f"X reuse check: {report['reuse_check']['committee_runs']} committee runs for identical submissions, expected 1", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+import os, sys, csv, json, time, argparse, threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, ALL_COMPLETED, wait
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+# allow `python evaluation/run_batch.py` from the project root
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from agents.runners import run_once, persist_result, prefetch, warm
+from agents.tracing import summarize
+from rag.retriever import retriever_stats
+from llm.cache import cache_stats
+from llm.local_llm import backend_stats
+from store.audit_sink import flush_all
+from main import append_jsonl
+
+DEFAULT_INPUT = os.path.join(PROJECT_ROOT, "data", "sample_data.csv")
+DEFAULT_OUTPUT = os.path.join(PROJECT_ROOT, "data", "outputs.csv")
+DEFAULT_CHECKPOINT = os.path.join(PROJECT_ROOT, "data", "run_batch.ckpt")
+REAUDIT_CHECKPOINT = os.path.join(PROJECT_ROOT, "data", "reaudit.{since}.ckpt")
+
+
+def iter_rows(path: str) -> Iterator[Dict[str, str]]:
+    """
+    Stream feature rows from a CSV (feature_name, feature_description) or JSONL file.
+    """
+    if path.lower().endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                item = json.loads(line)
+                yield {
+                    "feature_name": (item.get("feature_name") or "").strip(),
+                    "feature_description": (item.get("feature_description") or "").strip(),
+                }
+        return
+    # utf-8-sig: the sample CSV ships with a BOM
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for r in csv.DictReader(f):
+            yield {
+                "feature_name": (r.get("feature_name") or "").strip(),
+                "feature_description": (r.get("feature_description") or "").strip(),
+            }
+
+def load_checkpoint(path: str) -> Set[str]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return set(line.rstrip("\n") for line in f if line.strip())
+
+def run_batch(
+    input_path: str = DEFAULT_INPUT,
+    output_csv: str = DEFAULT_OUTPUT,
+    checkpoint_path: str = DEFAULT_CHECKPOINT,
+    workers: int = 2,
+    k: int = 5,
+    limit: Optional[int] = None,
+    profile: bool = False,
+    rows: Optional[Iterable[Dict[str, str]]] = None,
+    reuse: bool = True,
+) -> dict:
+    """
+    Classify every row of input_path (or of `rows`, when given) and persist the results.
+    reuse=False disables the near-duplicate verdict reuse in run_once.
+    """
+    done = load_checkpoint(checkpoint_path)
+    if done:
+        print(f"resume: {len(done)} features already in checkpoint")
+
+    # load the LLM backend (LLM_BACKEND), indexes and catalog up front
+    warm(k=k)
+
+    os.makedirs(os.path.dirname(checkpoint_path) or ".", exist_ok=True)
+    write_lock = threading.Lock()
+    stats = {"ok": 0, "failed": 0, "skipped": 0}
+    traces = []  # per-feature spans, kept only with profile=True
+    t0 = time.perf_counter()
+
+    with open(checkpoint_path, "a", encoding="utf-8") as ckpt:
+        persisted = []  # names whose outputs.csv rows may still sit in the audit sink queue
+
+        def _one(row: Dict[str, str]) -> None:
+            res = run_once(row["feature_name"], row["feature_description"], k=k, reuse=reuse)
+            with write_lock:
+                persist_result(res, row["feature_description"], csv_path=output_csv)
+                # same audit record (trace included) as main.py / daemon calls
+                append_jsonl(res)
+                persisted.append(row["feature_name"])
+                if profile:
+                    traces.append(res.get("trace") or [])
+
+        def _checkpoint() -> None:
+            # checkpoint only once the rows are on disk; one sink flush covers the whole group.
+            # If the flush failed (a write error or a rejected row), leave the group out so a
+            # resumed run redoes it: a duplicate output row beats a lost one.
+            with write_lock:
+                names = persisted[:]
+                del persisted[:]
+            if names:
+                if not flush_all():
+                    print(f"X audit sink flush failed: {len(names)} feature(s) not checkpointed", file=sys.stderr)
+                    return
+                ckpt.write("".join(n + "\n" for n in names))
+                ckpt.flush()
+
+        # bounded window so huge inputs are streamed, not materialized
+        max_in_flight = max(1, workers) * 2
+        in_flight = {}
+        submitted = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            def _drain(block_until_one: bool) -> None:
+                if not in_flight:
+                    return
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED if block_until_one else ALL_COMPLETED)
+                for fut in finished:
+                    name = in_flight.pop(fut)
+                    try:
+                        fut.result()
+                        stats["ok"] += 1
+                    except Exception as e:
+                        stats["failed"] += 1
+                        print(f"X {name}: {e}")
+                if len(persisted) >= max_in_flight or not block_until_one:
+                    _checkpoint()
+                processed = stats["ok"] + stats["failed"]
+                if processed and processed % 10 == 0:
+                    mins = (time.perf_counter() - t0) / 60.0
+                    print(f"  {processed} done, {stats['ok'] / mins if mins else 0.0:.2f} features/min")
+
+            def _submit_block(block) -> None:
+                # embed the whole block in one batch before its rows fan out to workers
+                prefetch([(r["feature_name"], r["feature_description"]) for r in block])
+                for r in block:
+                    in_flight[pool.submit(_one, r)] = r["feature_name"]
+                    if len(in_flight) >= max_in_flight:
+                        _drain(block_until_one=True)
+
+            block = []
+            for row in (rows if rows is not None else iter_rows(input_path)):
+                if limit is not None and submitted >= limit:
+                    break
+                name = row["feature_name"]
+                if not name or name in done:
+                    stats["skipped"] += 1
+                    continue
+                done.add(name)
+                block.append(row)
+                submitted += 1
+                if len(block) >= max_in_flight * 4:
+                    _submit_block(block)
+                    block = []
+            _submit_block(block)
+            _drain(block_until_one=False)
+            _checkpoint()
+
+    elapsed = time.perf_counter() - t0
+    stats["elapsed_s"] = round(elapsed, 2)
+    stats["features_per_min"] = round(stats["ok"] / (elapsed / 60.0), 2) if elapsed > 0 else 0.0
+    stats["retriever"] = retriever_stats()
+    stats["llm_cache"] = cache_stats()
+    stats["llm"] = backend_stats()
+    if profile:
+        # per-stage latency percentiles and token totals across the batch
+        stats["profile"] = summarize(traces)
+    return stats
+
+
+def reaudit(
+    changed_since: str,
+    output_csv: str = DEFAULT_OUTPUT,
+    checkpoint_path: Optional[str] = None,
+    workers: int = 2,
+    k: int = 5,
+    limit: Optional[int] = None,
+    profile: bool = False,
+    dry_run: bool = False,
+) -> dict:
+    """
+    Re-run only the features whose current decision used a catalog rule or RAG source
+    that changed since `changed_since` (see store.impact), most affected first. The
+    new decisions are appended as usual and supersede the old ones.
+    """
+    from store.impact import parse_since, plan_reaudit
+    since = parse_since(changed_since)
+    targets, plan = plan_reaudit(since)
+    runnable = [t for t in targets if t.get("feature_description")]
+    for t in targets:
+        if not t.get("feature_description"):
+            print(f"X {t['feature_name']}: no stored feature_description, re-run it from its input file")
+    if dry_run:
+        plan["targets"] = [{key: t[key] for key in ("decision_id", "feature_name", "rules", "sources", "jurisdictions")} for t in targets]
+        return {"plan": plan}
+    # one checkpoint per cut-off, so an interrupted re-audit resumes and a later one starts fresh
+    ckpt = checkpoint_path or REAUDIT_CHECKPOINT.format(since=int(since))
+    stats = run_batch(output_csv=output_csv, checkpoint_path=ckpt, workers=workers, k=k, limit=limit,
+                      profile=profile, rows=runnable, reuse=False)
+    stats["plan"] = plan
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Batch geo-compliance classification")
+    ap.add_argument("input", nargs="?", default=DEFAULT_INPUT, help="CSV or JSONL with feature_name, feature_description")
+    ap.add_argument("--output", default=DEFAULT_OUTPUT)
+    ap.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    ap.add_argument("--workers", type=int, default=int(os.getenv("BATCH_WORKERS", "2")))
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--limit", type=int, default=None)
+    ap.add_argument("--profile", action="store_true", help="report per-stage latency percentiles across the batch")
+    ap.add_argument("--reaudit", action="store_true", help="re-run decisions whose catalog rules or RAG sources changed (ignores input)")
+    ap.add_argument("--changed-since", default="7d", help="with --reaudit: epoch, ISO date/datetime or look-back like 36h, 7d")
+    ap.add_argument("--dry-run", action="store_true", help="with --reaudit: list affected decisions without running them")
+    args = ap.parse_args()
+
+    if args.reaudit:
+        stats = reaudit(args.changed_since, args.output, None if args.checkpoint == DEFAULT_CHECKPOINT else args.checkpoint,
+                        workers=args.workers, k=args.k, limit=args.limit, profile=args.profile, dry_run=args.dry_run)
+    else:
+        stats = run_batch(args.input, args.output, args.checkpoint, workers=args.workers, k=args.k, limit=args.limit, profile=args.profile)
+    print(json.dumps(stats, indent=2))
@@ -0,0 +1,68 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+# "transformers": HF causal LM, fp32 on CPU (the original path)
+# "quantized":    same model with its Linear layers dynamically quantized to int8
+# "onnx":         ONNX Runtime via optimum.onnxruntime
+# "openai":       any OpenAI-compatible chat completions server (vLLM, llama.cpp server, ...)
+# "stub":         deterministic offline stand-in for benchmarks (llm.stub_backend)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "transformers")
+MODEL_ID = os.environ.get("LLM_MODEL_ID", "Qwen/Qwen2.5-0.5B-Instruct")
+
+# (system prompt, user prompt, params) as accepted by generate_json_batch
+Item = Tuple[str, str, Optional[Dict]]
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token; used where no local tokenizer is loaded
+    return (len(text) + 3) // 4
+
+
+class LLMBackend:
+    """
+    Inference engine behind llm.local_llm. A backend turns (system, user, params)
+    items into raw completion strings; response caching and JSON parsing stay in
+    local_llm and its callers. params carries temperature, max_new_tokens and an
+    optional json_schema.
+    """
+
+    name = "base"
+
+    def generate_batch(self, items: List[Item], prefix: Optional[str] = None) -> List[str]:
+        raise NotImplementedError
+
+    def count_tokens(self, text: str) -> int:
+        return approx_tokens(text)
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+def backend_id(name: str = LLM_BACKEND) -> str:
+    """
+    Identifies the engine in response-cache keys. The transformers id is the bare
+    model id so caches written before backends existed stay valid.
+    """
+    if name == "transformers":
+        return MODEL_ID
+    if name == "openai":
+        from llm.openai_backend import API_MODEL
+        return f"openai:{API_MODEL}"
+    return f"{name}:{MODEL_ID}"
+
+
+def create_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    # imported here so the HTTP client never pulls in torch and vice versa
+    if name in ("transformers", "quantized"):
+        from llm.hf_backend import TransformersBackend
+        return TransformersBackend(MODEL_ID, quantize=(name == "quantized"))
+    if name == "onnx":
+        from llm.hf_backend import OnnxBackend
+        return OnnxBackend(MODEL_ID)
+    if name == "openai":
+        from llm.openai_backend import OpenAIBackend
+        return OpenAIBackend()
+    if name == "stub":
+        from llm.stub_backend import StubBackend
+        return StubBackend()
+    raise ValueError(f"unknown LLM_BACKEND {name!r} (transformers, quantized, onnx, openai, stub)")
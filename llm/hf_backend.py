@@ -0,0 +1,233 @@
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteria, StoppingCriteriaList
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import torch, os, copy, time, threading
+from agents import tracing
+from llm.backends import Item, LLMBackend
+
+# how many distinct prompt prefixes keep their KV cache alive (one per in-flight feature)
+PREFIX_CACHE_SIZE = int(os.environ.get("LLM_PREFIX_CACHE", "2"))
+
+# Simple chat format most instruct models accept. With a shared prefix the layout is
+# "<|system|>\n{prefix}{system}\n<|user|>..." so that everything before the per-call
+# system prompt is identical across committee members.
+def _prefix_head(prefix: str) -> str:
+    return f"<|system|>\n{prefix}"
+
+def _prefix_tail(system_prompt: str, user_prompt: str) -> str:
+    return f"{system_prompt}\n<|user|>\n{user_prompt}\n<|assistant|>\n"
+
+class _JsonScanner:
+    """
+    Incremental brace/string tracker; done once the top-level JSON object closes.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+        self.started = False
+        self.done = False
+
+    def feed(self, text: str) -> bool:
+        for ch in text:
+            if self.done:
+                break
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = self.started
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif ch == "}" and self.started:
+                self.depth -= 1
+                self.done = self.depth == 0
+        return self.done
+
+class _StopOnJsonClose(StoppingCriteria):
+    """
+    Per-row early stop: a row finishes as soon as its top-level object is closed,
+    so no tokens are spent on trailing prose or code fences.
+    """
+
+    def __init__(self, tokenizer, prompt_len: int, prefills: List[str]):
+        self.tokenizer = tokenizer
+        self.prompt_len = prompt_len
+        # called once per decoding step, so the first call marks the end of prefill
+        self.first_step_at: Optional[float] = None
+        self.seen = [0] * len(prefills)
+        self.scanners = []
+        for pre in prefills:
+            sc = _JsonScanner()
+            sc.feed(pre)
+            self.scanners.append(sc)
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_step_at is None:
+            self.first_step_at = time.perf_counter()
+        flags = []
+        for i, sc in enumerate(self.scanners):
+            if not sc.done:
+                new = input_ids[i, self.prompt_len + self.seen[i]:]
+                self.seen[i] += new.shape[0]
+                sc.feed(self.tokenizer.decode(new, skip_special_tokens=True))
+            flags.append(sc.done)
+        return torch.tensor(flags, dtype=torch.bool, device=input_ids.device)
+
+def _json_prefill(params: Optional[Dict]) -> str:
+    """
+    Guided start for schema-bound calls: the assistant turn is pre-seeded with the
+    opening brace and the schema's first property, which anchors the model on the
+    expected object instead of prose or a code fence.
+    """
+    schema = (params or {}).get("json_schema")
+    props = list((schema or {}).get("properties", {}))
+    if not props:
+        return ""
+    return '{"' + props[0] + '":'
+
+def _expand_kv(kv, batch: int):
+    # generate() appends to the cache in place, so every call gets its own copy
+    kv = copy.deepcopy(kv)
+    if batch == 1:
+        return kv
+    if hasattr(kv, "batch_repeat_interleave"):
+        kv.batch_repeat_interleave(batch)
+        return kv
+    # legacy tuple-of-tuples cache
+    return tuple(tuple(t.repeat_interleave(batch, dim=0) for t in layer) for layer in kv)
+
+
+class TransformersBackend(LLMBackend):
+    """
+    HF causal LM on CPU with batched left-padded generation, JSON early stop and a
+    prefix KV cache. quantize=True applies dynamic int8 quantization to the Linear
+    layers (weights int8, activations quantized on the fly), about 2x faster
+    decoding on AVX2/VNNI CPUs at a small quality cost.
+    """
+
+    name = "transformers"
+    # past_key_values can be handed to generate(), so shared prefixes are encoded once
+    reuse_prefix_kv = True
+
+    def __init__(self, model_id: str, quantize: bool = False):
+        self.model_id = model_id
+        self.tokenizer = AutoTokenizer.from_pretrained(model_id, use_fast=True)
+        # batched generation needs left padding so every prompt ends right before its first new token
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = self._load_model(model_id)
+        if quantize:
+            self.name = "quantized"
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self._prefix_lock = threading.Lock()
+        # prefix text -> (prefix input_ids [1, L], past_key_values for those L tokens)
+        self._prefix_kv: "OrderedDict[str, tuple]" = OrderedDict()
+        self._prefix_stats = {"hits": 0, "misses": 0, "prefix_tokens_reused": 0}
+
+    def _load_model(self, model_id: str):
+        # Force CPU to avoid disk offload; keep memory low
+        return AutoModelForCausalLM.from_pretrained(
+            model_id,
+            device_map={"": "cpu"},
+            low_cpu_mem_usage=True,
+        )
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def _get_prefix_kv(self, prefix: str):
+        """
+        past_key_values for the shared prefix, computed once and kept in a small LRU.
+        """
+        with self._prefix_lock:
+            hit = self._prefix_kv.get(prefix)
+            if hit is not None:
+                self._prefix_kv.move_to_end(prefix)
+                self._prefix_stats["hits"] += 1
+                self._prefix_stats["prefix_tokens_reused"] += hit[0].shape[1]
+                return hit
+            self._prefix_stats["misses"] += 1
+        ids = self.tokenizer(_prefix_head(prefix), return_tensors="pt", add_special_tokens=False)["input_ids"]
+        with torch.inference_mode(), tracing.span("prefix_prefill", prefix_tokens=int(ids.shape[1])):
+            kv = self.model(input_ids=ids, use_cache=True).past_key_values
+        with self._prefix_lock:
+            self._prefix_kv[prefix] = (ids, kv)
+            while len(self._prefix_kv) > max(1, PREFIX_CACHE_SIZE):
+                self._prefix_kv.popitem(last=False)
+        return ids, kv
+
+    def prefix_cache_stats(self) -> dict:
+        with self._prefix_lock:
+            return dict(self._prefix_stats, cached_prefixes=len(self._prefix_kv))
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "model": self.model_id, "prefix_cache": self.prefix_cache_stats()}
+
+    def generate_batch(self, items: List[Item], prefix: Optional[str] = None) -> List[str]:
+        tok = self.tokenizer
+        budgets = [int((p or {}).get("max_new_tokens", 600)) for _, _, p in items]
+        prefills = [_json_prefill(p) for _, _, p in items]
+        if prefix and self.reuse_prefix_kv:
+            prefix_ids, kv = self._get_prefix_kv(prefix)
+            tails = tok([_prefix_tail(s, u) + pre for (s, u, _), pre in zip(items, prefills)], return_tensors="pt", padding=True, add_special_tokens=False)
+            n = len(items)
+            # pads sit between prefix and tail; they are masked out and skipped by position ids
+            inputs = {
+                "input_ids": torch.cat([prefix_ids.expand(n, -1), tails["input_ids"]], dim=1),
+                "attention_mask": torch.cat([torch.ones((n, prefix_ids.shape[1]), dtype=tails["attention_mask"].dtype), tails["attention_mask"]], dim=1),
+                "past_key_values": _expand_kv(kv, n),
+            }
+        else:
+            head = _prefix_head(prefix) if prefix else "<|system|>\n"
+            prompts = [head + _prefix_tail(s, u) + pre for (s, u, _), pre in zip(items, prefills)]
+            inputs = dict(tok(prompts, return_tensors="pt", padding=True))
+        prompt_len = inputs["input_ids"].shape[1]
+        stop = _StopOnJsonClose(tok, prompt_len, prefills)
+        # Deterministic, short outputs for speed on CPU
+        with torch.inference_mode(), tracing.span("generate", backend=self.name, batch=len(items)) as sp:
+            t0 = time.perf_counter()
+            out = self.model.generate(
+                **inputs,
+                max_new_tokens=max(budgets),
+                do_sample=False,              # deterministic, ignores temperature
+                num_beams=1,
+                eos_token_id=tok.eos_token_id,
+                pad_token_id=tok.pad_token_id,
+                stopping_criteria=StoppingCriteriaList([stop]),
+            )
+            if sp is not None:
+                t1 = time.perf_counter()
+                first = stop.first_step_at or t1
+                sp.update(
+                    prompt_tokens=int(inputs["attention_mask"].sum()),
+                    gen_tokens=int((out[:, prompt_len:] != tok.pad_token_id).sum()),
+                    prefill_ms=round((first - t0) * 1000.0, 3),
+                    decode_ms=round((t1 - first) * 1000.0, 3),
+                )
+        return [
+            (prefills[i] + tok.decode(out[i, prompt_len:prompt_len + budgets[i]], skip_special_tokens=True)).strip()
+            for i in range(len(items))
+        ]
+
+
+class OnnxBackend(TransformersBackend):
+    """
+    The same generation loop on ONNX Runtime (optimum.onnxruntime), exported on
+    first load. The ORT model does not take an external KV cache, so shared
+    prefixes are re-encoded per call.
+    """
+
+    name = "onnx"
+    reuse_prefix_kv = False
+
+    def _load_model(self, model_id: str):
+        from optimum.onnxruntime import ORTModelForCausalLM
+        return ORTModelForCausalLM.from_pretrained(model_id, export=True, use_cache=True)
@@ -1,27 +1,92 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch, os
-
-MODEL_ID = os.environ.get("LLM_MODEL_ID", "Qwen/Qwen2.5-0.5B-Instruct")
-
-_tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, use_fast=True)
-# Force CPU to avoid disk offload; keep memory low
-_model = AutoModelForCausalLM.from_pretrained(
-    MODEL_ID,
-    device_map={"": "cpu"},
-    low_cpu_mem_usage=True,
-)
-
-def generate_json(system_prompt: str, user_prompt: str, temperature: float = 0.0, max_new_tokens: int = 600) -> str:
-    # Build a simple chat format most instruct models accept
-    prompt = f"<|system|>\n{system_prompt}\n<|user|>\n{user_prompt}\n<|assistant|>\n"
-    inputs = _tokenizer(prompt, return_tensors="pt")
-    # Deterministic, short outputs for speed on CPU
-    out = _model.generate(
-        **{k: v for k, v in inputs.items()},
-        max_new_tokens=max_new_tokens,
-        do_sample=False,              # deterministic, ignores temperature
-        num_beams=1,
-        eos_token_id=_tokenizer.eos_token_id,
-        pad_token_id=_tokenizer.eos_token_id,
-    )
-    return _tokenizer.decode(out[0], skip_special_tokens=True).split("<|assistant|>")[-1].strip()
\ No newline at end of file
+from typing import Dict, List, Optional, Tuple
+import threading
+from llm.cache import get_cache, make_key
+from llm.backends import LLM_BACKEND, LLMBackend, backend_id, create_backend
+from llm.scheduler import SCHED_ENABLED, MicroBatcher
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+_batcher: Optional[MicroBatcher] = None
+
+def get_backend() -> LLMBackend:
+    """
+    Process-wide inference backend selected by LLM_BACKEND (see llm.backends).
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend(LLM_BACKEND)
+        return _backend
+
+def get_batcher() -> Optional[MicroBatcher]:
+    """
+    Shared micro-batching queue in front of the backend (LLM_BATCH_SCHED=1), else None.
+    """
+    global _batcher
+    if not SCHED_ENABLED:
+        return None
+    backend = get_backend()
+    with _backend_lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(backend)
+        return _batcher
+
+def backend_stats() -> dict:
+    stats = get_backend().stats()
+    batcher = get_batcher()
+    if batcher is not None:
+        stats["scheduler"] = batcher.stats()
+    return stats
+
+def count_tokens(text: str) -> int:
+    return get_backend().count_tokens(text)
+
+def generate_json(system_prompt: str, user_prompt: str, temperature: float = 0.0, max_new_tokens: int = 600, prefix: Optional[str] = None, json_schema: Optional[Dict] = None) -> str:
+    params = {"temperature": temperature, "max_new_tokens": max_new_tokens}
+    if json_schema:
+        params["json_schema"] = json_schema
+    return generate_json_batch([(system_prompt, user_prompt, params)], prefix=prefix)[0]
+
+def generate_json_batch(items: List[Tuple[str, str, Optional[Dict]]], prefix: Optional[str] = None) -> List[str]:
+    """
+    Generate several (system, user, params) prompts as one backend batch.
+    params accepts temperature, max_new_tokens and json_schema. With the local
+    backends the batch is one left-padded forward pass that decodes up to the
+    largest max_new_tokens, trims each output to its own budget and stops every
+    row as soon as its top-level JSON object closes.
+    If prefix is given it is prepended to every prompt and its KV cache is reused
+    instead of being re-encoded per call. Deterministic calls go through the
+    persistent response cache (llm.cache). With LLM_BATCH_SCHED=1 cache misses are
+    queued and batched together with those of other threads (llm.scheduler).
+    """
+    if not items:
+        return []
+    # serve deterministic calls from the persistent response cache, generate the rest
+    cache = get_cache()
+    outs: List[Optional[str]] = [None] * len(items)
+    keys: List[Optional[str]] = [None] * len(items)
+    if cache is not None:
+        for i, (s, u, p) in enumerate(items):
+            if is_cacheable(p):
+                keys[i] = response_key(s, u, p, prefix)
+                outs[i] = cache.get(keys[i])
+    todo = [i for i, o in enumerate(outs) if o is None]
+    if todo:
+        batcher = get_batcher()
+        run = batcher.submit if batcher is not None else get_backend().generate_batch
+        fresh = run([items[i] for i in todo], prefix)
+        for i, o in zip(todo, fresh):
+            outs[i] = o
+            if keys[i] is not None:
+                cache.put(keys[i], o)
+    return outs
+
+def is_cacheable(params: Optional[Dict]) -> bool:
+    # sampled calls (temperature > 0) are not reproducible, so never cache them
+    return float((params or {}).get("temperature", 0.0)) <= 0.0
+
+def response_key(system_prompt: str, user_prompt: str, params: Optional[Dict], prefix: Optional[str] = None, kind: str = "text") -> str:
+    p = dict(params or {})
+    p.setdefault("temperature", 0.0)
+    p.setdefault("max_new_tokens", 600)
+    return make_key(kind, backend_id(), prefix or "", system_prompt, user_prompt, p)
@@ -0,0 +1,96 @@
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from agents import tracing
+from llm.backends import MODEL_ID, Item, LLMBackend
+
+API_BASE = os.environ.get("LLM_API_BASE", "http://127.0.0.1:8000/v1")
+API_KEY = os.environ.get("LLM_API_KEY", "")
+API_MODEL = os.environ.get("LLM_API_MODEL", MODEL_ID)
+# requests in flight per process; also the size of the keep-alive connection pool
+API_CONCURRENCY = int(os.environ.get("LLM_API_CONCURRENCY", "8"))
+API_TIMEOUT = float(os.environ.get("LLM_API_TIMEOUT", "120"))
+# "json_object", "json_schema" (vLLM, llama.cpp server) or "none" for servers without response_format
+API_JSON_MODE = os.environ.get("LLM_API_JSON_MODE", "json_object")
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Client for an OpenAI-compatible /chat/completions server. One pooled keep-alive
+    session is shared by all threads, and the items of a batch are sent concurrently,
+    so batching and prefix reuse are left to the server (continuous batching,
+    prompt caching). The shared prefix is sent ahead of the system prompt, the
+    same layout as the local backends, so server-side prefix caches can hit.
+    """
+
+    name = "openai"
+
+    def __init__(self, base_url: str = API_BASE, model: str = API_MODEL, api_key: str = API_KEY,
+                 concurrency: int = API_CONCURRENCY, timeout: float = API_TIMEOUT, json_mode: str = API_JSON_MODE):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.timeout = timeout
+        self.json_mode = json_mode
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["POST"]))
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm-http")
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0, "http_s_total": 0.0}
+
+    def _payload(self, system_prompt: str, user_prompt: str, params: Optional[Dict], prefix: Optional[str]) -> Dict:
+        p = params or {}
+        body = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": (prefix or "") + system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "temperature": float(p.get("temperature", 0.0)),
+            "max_tokens": int(p.get("max_new_tokens", 600)),
+        }
+        schema = p.get("json_schema")
+        if self.json_mode == "json_schema" and schema:
+            body["response_format"] = {"type": "json_schema", "json_schema": {"name": "result", "schema": schema}}
+        elif self.json_mode != "none":
+            body["response_format"] = {"type": "json_object"}
+        return body
+
+    def _post(self, body: Dict) -> Tuple[str, Dict]:
+        t0 = time.perf_counter()
+        try:
+            r = self.session.post(self.url, json=body, timeout=self.timeout)
+            r.raise_for_status()
+            data = r.json()
+        except Exception:
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        usage = data.get("usage") or {}
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+            self._stats["completion_tokens"] += int(usage.get("completion_tokens") or 0)
+            self._stats["http_s_total"] += time.perf_counter() - t0
+        return (data["choices"][0]["message"].get("content") or "").strip(), usage
+
+    def generate_batch(self, items: List[Item], prefix: Optional[str] = None) -> List[str]:
+        bodies = [self._payload(s, u, p, prefix) for s, u, p in items]
+        # prefill and decode happen server-side; only token counts are reported back
+        with tracing.span("generate", backend=self.name, batch=len(items)) as sp:
+            replies = [self._post(bodies[0])] if len(bodies) == 1 else list(self._pool.map(self._post, bodies))
+            if sp is not None:
+                sp["prompt_tokens"] = sum(int(u.get("prompt_tokens") or 0) for _, u in replies)
+                sp["gen_tokens"] = sum(int(u.get("completion_tokens") or 0) for _, u in replies)
+        return [text for text, _ in replies]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, backend=self.name, model=self.model, url=self.url)
@@ -0,0 +1,146 @@
+import os, time, threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from agents import tracing
+from llm.backends import Item, LLMBackend, approx_tokens
+
+# LLM_BATCH_SCHED=1 routes every generate call through one shared micro-batching queue
+SCHED_ENABLED = os.environ.get("LLM_BATCH_SCHED", "0") == "1"
+# largest batch handed to the backend in one generate call
+MAX_BATCH = int(os.environ.get("LLM_BATCH_MAX", "8"))
+# how long the oldest queued prompt may wait for others to join its batch
+MAX_WAIT_MS = float(os.environ.get("LLM_BATCH_WAIT_MS", "10"))
+# prompts are bucketed by approximate length in powers of two from this size, so a
+# batch never pads a short prompt up to one many times longer
+MIN_BUCKET_TOKENS = int(os.environ.get("LLM_BATCH_MIN_BUCKET", "256"))
+
+
+def _bucket(item: Item, prefix: Optional[str]) -> int:
+    system_prompt, user_prompt, _ = item
+    n = approx_tokens((prefix or "") + system_prompt + user_prompt) // max(1, MIN_BUCKET_TOKENS)
+    return n.bit_length()
+
+
+def _fold(item: Item, prefix: Optional[str]) -> Item:
+    # the HF and OpenAI backends send prefix + system prompt and the stub scans
+    # prefix + system + user, so each of them sees the same text after folding
+    system_prompt, user_prompt, params = item
+    return ((prefix or "") + system_prompt, user_prompt, params)
+
+
+class _Request:
+    __slots__ = ("item", "prefix", "bucket", "enqueued", "done", "out", "error", "batch", "spans")
+
+    def __init__(self, item: Item, prefix: Optional[str]):
+        self.item = item
+        self.prefix = prefix
+        self.bucket = _bucket(item, prefix)
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.out: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        self.batch = 0
+        self.spans: List[Dict] = []
+
+
+class MicroBatcher:
+    """
+    Request queue in front of a single backend. Prompts from concurrent callers
+    (run_batch workers, daemon connections) are held for up to max_wait_ms, grouped
+    by length bucket, and run as one generate_batch call of at most max_batch
+    prompts; each caller blocks until its own output is back. A batch mixing
+    features sends each prompt with its prefix inlined, trading the prefix KV
+    cache for a fuller batch. The oldest queued prompt decides which group runs
+    next, so no bucket starves.
+    """
+
+    def __init__(self, backend: LLMBackend, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.backend = backend
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: Deque[_Request] = deque()
+        self._cond = threading.Condition()
+        self._stats = {"requests": 0, "completed": 0, "batches": 0, "errors": 0, "max_queue_depth": 0, "queue_wait_s_total": 0.0}
+        self._sizes: Dict[int, int] = {}
+        self._worker = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, items: List[Item], prefix: Optional[str] = None) -> List[str]:
+        reqs = [_Request(it, prefix) for it in items]
+        with tracing.span("llm_queue", prompts=len(reqs)) as sp:
+            with self._cond:
+                self._queue.extend(reqs)
+                self._stats["requests"] += len(reqs)
+                self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._queue))
+                self._cond.notify()
+            for r in reqs:
+                r.done.wait()
+            if sp is not None:
+                sp["batch"] = max(r.batch for r in reqs)
+            # the generate span ran on the batcher thread; copy it into this feature's trace
+            seen = set()
+            for r in reqs:
+                if id(r.spans) not in seen:
+                    seen.add(id(r.spans))
+                    tracing.adopt(r.spans)
+        for r in reqs:
+            if r.error is not None:
+                raise r.error
+        return [r.out for r in reqs]
+
+    def _take(self) -> List[_Request]:
+        # called with the lock held; blocks until the oldest request's group is due
+        while True:
+            while not self._queue:
+                self._cond.wait()
+            head = self._queue[0]
+            group = [r for r in self._queue if r.bucket == head.bucket][: self.max_batch]
+            remaining = head.enqueued + self.max_wait - time.perf_counter()
+            if len(group) >= self.max_batch or remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        picked = set(map(id, group))
+        self._queue = deque(r for r in self._queue if id(r) not in picked)
+        return group
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                batch = self._take()
+            now = time.perf_counter()
+            spans: List[Dict] = []
+            try:
+                prefixes = {r.prefix for r in batch}
+                if len(prefixes) == 1:
+                    # one feature's committee (or features sharing a prefix): keep the prefix KV reuse
+                    items, prefix = [r.item for r in batch], batch[0].prefix
+                else:
+                    items, prefix = [_fold(r.item, r.prefix) for r in batch], None
+                with tracing.trace(spans):
+                    outs = self.backend.generate_batch(items, prefix)
+                for r, o in zip(batch, outs):
+                    r.out = o
+            except BaseException as e:
+                for r in batch:
+                    r.error = e
+            for rec in spans:
+                # token counts cover the whole batch; tracing.summarize splits them by shared_by
+                rec["shared_by"] = len(batch)
+            with self._cond:
+                self._stats["batches"] += 1
+                self._stats["completed"] += len(batch)
+                self._stats["errors"] += int(batch[0].error is not None)
+                self._stats["queue_wait_s_total"] += sum(now - r.enqueued for r in batch)
+                self._sizes[len(batch)] = self._sizes.get(len(batch), 0) + 1
+            for r in batch:
+                r.batch = len(batch)
+                r.spans = spans
+                r.done.set()
+
+    def stats(self) -> dict:
+        with self._cond:
+            s = dict(self._stats, queue_depth=len(self._queue), max_batch=self.max_batch, max_wait_ms=self.max_wait * 1000.0)
+            s["batch_sizes"] = dict(sorted(self._sizes.items()))
+        s["mean_batch"] = round(s["completed"] / s["batches"], 3) if s["batches"] else 0.0
+        s["mean_queue_wait_ms"] = round(s["queue_wait_s_total"] * 1000.0 / s["completed"], 3) if s["completed"] else 0.0
+        return s
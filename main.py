@@ -1,19 +1,43 @@
-import sys, json, os
-from agents.runners import run_once, append_csv
+import sys, json, os, threading
+from store.results import get_store
 
-def similar_features_by_reg(csv_path="data/outputs.csv", regs=None, top_n=5):
-    if not (regs and os.path.exists(csv_path)):
+_persist_lock = threading.Lock()
+AUDIT_LOG = os.environ.get("AUDIT_LOG", "data/audit_log.jsonl")
+
+def append_jsonl(row: dict, path: str = AUDIT_LOG):
+    # full results, trace included; buffered, fsynced and rotated by store.audit_sink
+    from store.audit_sink import AUDIT_FORMAT, get_sink
+    if AUDIT_FORMAT == "msgpack":
+        path = os.path.splitext(path)[0] + ".msgpack"
+    get_sink(path, fmt=AUDIT_FORMAT).append(row)
+
+def similar_features_by_reg(regs=None, top_n=5):
+    # indexed lookup in the results store instead of scanning outputs.csv
+    if not regs:
         return []
-    import pandas as pd
-    df = pd.read_csv(csv_path)
-    out = []
-    for _, r in df.iterrows():
-        prior_regs = set((r.get("regulations") or "").split("|"))
-        if prior_regs & set(regs):
-            out.append(r["feature_name"])
-    return out[:top_n]
+    return get_store().features_by_regulation(regs, top_n=top_n)
+
+def classify(name: str, desc: str) -> dict:
+    """
+    Classify one feature, attach similar prior features and persist it.
+    Shared by the in-process CLI path and the daemon.
+    """
+    # the pipeline (models, indexes, catalog) is only imported when a feature is actually classified
+    from agents.runners import run_once, persist_result
+    res = run_once(name, desc)
+    res["similar_features"] = similar_features_by_reg(regs=res["regulations"])
+    with _persist_lock:
+        persist_result(res, desc)
+    append_jsonl(res)
+    return res
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["--daemon"]:
+        # long-lived warm process; later `python main.py ...` calls are served over its socket
+        from agents.daemon import serve
+        serve(classify)
+        sys.exit(0)
+
     if len(sys.argv) >= 3:
         name = sys.argv[1]
         desc = " ".join(sys.argv[2:])
@@ -21,13 +45,15 @@ if __name__ == "__main__":
         name = "Curfew login blocker with ASL and GH for Utah minors"
         desc = "To comply with the Utah Social Media Regulation Act, we restrict logins for under-18 users at night within Utah via GH. EchoTrace logs for audits."
 
-    res = run_once(name, desc)
-    res["similar_features"] = similar_features_by_reg(regs=res["regulations"])
-
-    def append_jsonl(row: dict, path: str = "data/audit_log.jsonl"):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    from agents.daemon import request
+    reply = None
+    if os.environ.get("AGENT_NO_DAEMON") != "1":
+        reply = request({"op": "classify", "feature_name": name, "feature_description": desc})
+    if reply is None:
+        res = classify(name, desc)
+    elif reply.get("ok"):
+        res = reply["result"]
+    else:
+        print(reply.get("error"), file=sys.stderr)
+        sys.exit(1)
     print(json.dumps(res, indent=2, ensure_ascii=False))
-    append_csv(res)
-
@@ -0,0 +1,63 @@
+import math, re, heapq
+from typing import Dict, Iterable, List, Tuple
+
+# keep statute-ish tokens whole: "2258a", "u.s.c", "sb976", "art-16", and the section sign
+_TOKEN_RE = re.compile(r"§|[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+_STOP = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with we our"
+    " their they such any all may shall must not which who".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOP and (len(t) > 1 or t == "§" or t.isdigit())]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index. A query only touches the postings of its
+    own terms, so lookup cost grows with matches rather than with corpus size.
+    """
+
+    def __init__(self, docs: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_len: List[int] = []
+        for doc_id, text in enumerate(docs):
+            tf: Dict[str, int] = {}
+            toks = tokenize(text)
+            for t in toks:
+                tf[t] = tf.get(t, 0) + 1
+            for t, n in tf.items():
+                self.postings.setdefault(t, []).append((doc_id, n))
+            self.doc_len.append(len(toks))
+        self.n_docs = len(self.doc_len)
+        self.avgdl = (sum(self.doc_len) / self.n_docs) if self.n_docs else 0.0
+        self.idf = {
+            t: math.log(1.0 + (self.n_docs - len(p) + 0.5) / (len(p) + 0.5))
+            for t, p in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def scores(self, query: str) -> Dict[int, float]:
+        acc: Dict[int, float] = {}
+        if not self.n_docs:
+            return acc
+        for t in set(tokenize(query)):
+            plist = self.postings.get(t)
+            if not plist:
+                continue
+            idf = self.idf[t]
+            for doc_id, tf in plist:
+                norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[doc_id] / (self.avgdl or 1.0))
+                acc[doc_id] = acc.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return acc
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        [(doc_id, score)] best first; only documents sharing a term with the query.
+        """
+        acc = self.scores(query)
+        return heapq.nlargest(top_k, acc.items(), key=lambda x: x[1])
@@ -0,0 +1,156 @@
+import os, fcntl, hashlib, threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, List, Optional
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.environ.get("EMBED_CACHE_DIR", os.path.join(PROJECT_ROOT, "data", "embed_cache"))
+MEM_ITEMS = int(os.environ.get("EMBED_CACHE_MEM", "4096"))
+
+
+def text_key(model_id: str, kind: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    # content hash of a source file (rag/ingest.py manifest, tools/update_cat.py catalog entries)
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@contextmanager
+def flocked(path: str):
+    """
+    Exclusive flock on a side file for the duration of the block, for append-only
+    stores shared by several processes (this cache, store.decision_index).
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache keyed by text hash: an in-memory LRU in front of an
+    append-only on-disk float32 matrix (vectors.f32 + keys.txt) read through np.memmap.
+    """
+
+    def __init__(self, path: str = CACHE_DIR, mem_items: int = MEM_ITEMS):
+        os.makedirs(path, exist_ok=True)
+        self.vec_path = os.path.join(path, "vectors.f32")
+        self.keys_path = os.path.join(path, "keys.txt")
+        self.dim_path = os.path.join(path, "dim.txt")
+        # held around appends: the warm daemon, run_batch and the CLI share this directory
+        self.lock_path = os.path.join(path, "cache.lock")
+        self.mem_items = mem_items
+        self._lock = threading.Lock()
+        self._mem: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._rows = {}
+        self.dim: Optional[int] = None
+        self._mm: Optional[np.memmap] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        with flocked(self.lock_path):
+            self._sync()
+
+    def _sync(self) -> None:
+        # (re)read keys.txt and cut both files back to the rows they agree on; caller holds the flock
+        if not os.path.exists(self.keys_path) and os.path.exists(self.vec_path):
+            os.remove(self.vec_path)  # vectors without keys are unusable
+        if self.dim is None and os.path.exists(self.dim_path):
+            with open(self.dim_path, "r", encoding="utf-8") as f:
+                self.dim = int(f.read().strip())
+        if self.dim is None or not os.path.exists(self.keys_path):
+            return
+        dim = self.dim
+        with open(self.keys_path, "r", encoding="utf-8") as f:
+            keys = f.read().split()
+        size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        n = min(len(keys), size // 4 // dim)
+        # a crash mid-append can leave the two files out of step; cut both back to n rows
+        if size != n * dim * 4:
+            with open(self.vec_path, "r+b") as f:
+                f.truncate(n * dim * 4)
+        if n != len(keys):
+            with open(self.keys_path, "w", encoding="utf-8") as f:
+                f.write("".join(k + "\n" for k in keys[:n]))
+        self._rows = {k: i for i, k in enumerate(keys[:n])}
+
+    def _disk_row(self, row: int) -> np.ndarray:
+        if self._mm is None or self._mm.shape[0] <= row:
+            n = os.path.getsize(self.vec_path) // 4 // self.dim
+            self._mm = np.memmap(self.vec_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return np.array(self._mm[row])
+
+    def _remember(self, key: str, vec: np.ndarray) -> None:
+        self._mem[key] = vec
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_items:
+            self._mem.popitem(last=False)
+
+    def get_many(self, keys: List[str], texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        """
+        Vectors for `texts` (one row each); misses are embedded in a single embed_fn batch.
+        """
+        out: List[Optional[np.ndarray]] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vec = self._mem.get(key)
+                if vec is not None:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                elif key in self._rows:
+                    vec = self._disk_row(self._rows[key])
+                    self._remember(key, vec)
+                    self.disk_hits += 1
+                out[i] = vec
+        todo = [i for i, v in enumerate(out) if v is None]
+        if todo:
+            # duplicates inside one batch are embedded once
+            uniq = list(dict.fromkeys(keys[i] for i in todo))
+            first = {keys[i]: i for i in reversed(todo)}
+            fresh = np.asarray(embed_fn([texts[first[k]] for k in uniq]), dtype=np.float32)
+            by_key = dict(zip(uniq, fresh))
+            with self._lock, flocked(self.lock_path):
+                self.misses += len(uniq)
+                if self.dim is None and not os.path.exists(self.dim_path):
+                    self.dim = fresh.shape[1]
+                    with open(self.dim_path, "w", encoding="utf-8") as f:
+                        f.write(str(self.dim))
+                # row numbers come from the file, not from this process's count: another
+                # process may have appended since we last looked, so pick up its keys first
+                size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+                if self.dim is None or size != len(self._rows) * self.dim * 4:
+                    self._sync()
+                new_keys = [k for k in uniq if k not in self._rows]
+                if new_keys:
+                    with open(self.vec_path, "ab") as f:
+                        for k in new_keys:
+                            f.write(by_key[k].tobytes())
+                    with open(self.keys_path, "a", encoding="utf-8") as f:
+                        for k in new_keys:
+                            self._rows[k] = len(self._rows)
+                            f.write(k + "\n")
+                for k in uniq:
+                    self._remember(k, by_key[k])
+            for i in todo:
+                out[i] = by_key[keys[i]]
+        return np.vstack(out) if out else np.zeros((0, self.dim or 0), dtype=np.float32)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mem_hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "mem_items": len(self._mem),
+                "disk_items": len(self._rows),
+            }
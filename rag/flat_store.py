@@ -0,0 +1,143 @@
+import os, json, mmap
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+FLAT_DIR = "flat"   # sub-directory of the llama-index persist dir
+# int8 rows dequantized per step of search(); bounds the float32 scratch to SEARCH_CHUNK x d
+SEARCH_CHUNK = int(os.environ.get("FLAT_SEARCH_CHUNK", "16384"))
+
+
+class FlatStore:
+    """
+    Read-only flat vector store on memory-mapped files:
+      vectors.npy             float32 [n, d], L2-normalized (or vectors_i8.npy + scales.npy when int8)
+      nodes.jsonl/offsets.npy node id, text and metadata, one JSON line per row, located by byte offset
+    Loading maps the files instead of parsing them, so startup is O(1) and worker
+    processes share the same page-cache pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.quantized = self.meta.get("dtype") == "int8"
+        if self.quantized:
+            self.vectors = np.load(os.path.join(path, "vectors_i8.npy"), mmap_mode="r")
+            self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        else:
+            self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+            self.scales = None
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._nodes_f = open(os.path.join(path, "nodes.jsonl"), "rb")
+        size = os.fstat(self._nodes_f.fileno()).st_size
+        self._nodes = mmap.mmap(self._nodes_f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    def node(self, i: int) -> Dict:
+        a, b = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._nodes[a:b])
+
+    def search(self, queries: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k rows per query by cosine similarity: one matmul plus argpartition.
+        int8 stores are scored SEARCH_CHUNK rows at a time (dequantize, scale, keep the
+        chunk's top k), so a query never materializes the whole matrix as float32.
+        queries: [m, d] L2-normalized. Returns (indices [m, k], scores [m, k]) best first.
+        """
+        q = np.asarray(queries, dtype=np.float32)
+        if q.ndim == 1:
+            q = q[None, :]
+        n = len(self)
+        k = min(k, n)
+        if k == 0:
+            return np.zeros((q.shape[0], 0), dtype=np.int64), np.zeros((q.shape[0], 0), dtype=np.float32)
+        rows = np.arange(q.shape[0])[:, None]
+        if self.quantized:
+            cand_idx, cand_sims = [], []
+            for a in range(0, n, SEARCH_CHUNK):
+                b = min(n, a + SEARCH_CHUNK)
+                chunk = (q @ self.vectors[a:b].astype(np.float32).T) * self.scales[None, a:b]
+                kk = min(k, b - a)
+                part = np.argpartition(-chunk, kk - 1, axis=1)[:, :kk]
+                cand_idx.append(part + a)
+                cand_sims.append(chunk[rows, part])
+            idx, sims = np.hstack(cand_idx), np.hstack(cand_sims)
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            order = np.argsort(-sims[rows, top], axis=1)
+            top = top[rows, order]
+            return idx[rows, top], sims[rows, top]
+        sims = q @ self.vectors.T
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        order = np.argsort(-sims[rows, top], axis=1)
+        top = top[rows, order]
+        return top, sims[rows, top]
+
+    def close(self) -> None:
+        if not isinstance(self._nodes, bytes):
+            self._nodes.close()
+        self._nodes_f.close()
+
+
+def write_flat_store(path: str, ids: Sequence[str], embeddings: np.ndarray, nodes: Sequence[Dict],
+                     quantize: Optional[str] = None, embed_model: str = "") -> None:
+    """
+    Write a FlatStore. nodes[i] is {"id", "text", "metadata"} for embeddings[i].
+    quantize="int8" stores symmetric per-row int8 vectors (4x smaller, ~1e-2 cosine error).
+    Files are written under temp names and renamed into place, meta.json last.
+    """
+    os.makedirs(path, exist_ok=True)
+    emb = np.asarray(embeddings, dtype=np.float32)
+    emb = emb.reshape(len(ids), -1) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    emb = emb / norms
+
+    def _tmp(name: str) -> str:
+        return os.path.join(path, "." + name + ".tmp")
+
+    written: List[str] = []
+    if quantize == "int8":
+        scales = np.abs(emb).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        q = np.round(emb / scales[:, None]).astype(np.int8)
+        for name, arr in (("vectors_i8.npy", q), ("scales.npy", scales.astype(np.float32))):
+            with open(_tmp(name), "wb") as f:
+                np.save(f, arr)
+            written.append(name)
+    else:
+        with open(_tmp("vectors.npy"), "wb") as f:
+            np.save(f, emb)
+        written.append("vectors.npy")
+
+    offsets = [0]
+    with open(_tmp("nodes.jsonl"), "wb") as f:
+        for node_id, n in zip(ids, nodes):
+            line = (json.dumps({"id": node_id, "text": n.get("text", ""), "metadata": n.get("metadata") or {}}, ensure_ascii=False) + "\n").encode("utf-8")
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    written.append("nodes.jsonl")
+    with open(_tmp("offsets.npy"), "wb") as f:
+        np.save(f, np.asarray(offsets, dtype=np.int64))
+    written.append("offsets.npy")
+    meta = {"n": len(ids), "dim": int(emb.shape[1]) if emb.size else 0,
+            "dtype": "int8" if quantize == "int8" else "float32", "embed_model": embed_model}
+    with open(_tmp("meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    written.append("meta.json")  # last: its presence marks a complete store
+    for name in written:
+        os.replace(_tmp(name), os.path.join(path, name))
+
+
+def export_index(index, path: str, quantize: Optional[str] = None, embed_model: str = "") -> int:
+    """
+    Export a llama-index VectorStoreIndex (SimpleVectorStore) to a FlatStore. Returns row count.
+    """
+    emb = index.vector_store.data.embedding_dict
+    ids = list(emb.keys())
+    docs = index.docstore.get_nodes(ids) if ids else []
+    nodes = [{"text": d.get_content(metadata_mode="none"), "metadata": dict(d.metadata or {})} for d in docs]
+    mat = np.asarray([emb[i] for i in ids], dtype=np.float32) if ids else np.zeros((0, 0), dtype=np.float32)
+    write_flat_store(path, ids, mat, nodes, quantize=quantize, embed_model=embed_model)
+    return len(ids)
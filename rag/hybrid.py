@@ -0,0 +1,187 @@
+import os, threading, time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.base.response.schema import Response
+from rag.bm25 import BM25Index, tokenize
+from rag import retriever
+from rag.flat_store import FLAT_DIR
+from agents import tracing
+from llm.backends import approx_tokens
+
+# dense and lexical candidates per query before fusion
+CANDIDATES = int(os.environ.get("RAG_CANDIDATES", "20"))
+# reciprocal rank fusion constant: score = sum 1 / (RRF_K + rank)
+RRF_K = int(os.environ.get("RAG_RRF_K", "60"))
+# token budget for the whole retrieved context block (catalog snippets + chunks)
+CONTEXT_TOKENS = int(os.environ.get("RAG_CONTEXT_TOKENS", "2048"))
+# RAG_HYBRID=0 keeps dense-only candidates (still deduplicated and budgeted)
+HYBRID = os.environ.get("RAG_HYBRID", "1") != "0"
+# optional cross-encoder over the fused candidates, e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_MODEL = os.environ.get("RAG_RERANK_MODEL", "")
+# a chunk whose word 5-grams are mostly contained in a higher-ranked chunk is dropped
+DUP_OVERLAP = 0.8
+
+_lock = threading.RLock()
+# persist_dir -> (index files signature, node id -> node, corpus node ids, BM25 over them)
+_lexical: Dict[str, Tuple[tuple, Dict[str, TextNode], List[str], BM25Index]] = {}
+_reranker = None
+
+
+def _corpus_signature(persist_dir: str) -> tuple:
+    if retriever._use_flat(persist_dir):
+        return retriever._index_signature(os.path.join(persist_dir, FLAT_DIR))
+    return retriever._index_signature(persist_dir)
+
+
+def _lexical_index(persist_dir: str) -> Tuple[Dict[str, TextNode], List[str], BM25Index]:
+    """
+    BM25 over every chunk of the persisted index, rebuilt only when the index files change.
+    """
+    key = os.path.abspath(persist_dir)
+    sig = _corpus_signature(persist_dir)
+    with _lock:
+        cached = _lexical.get(key)
+        if cached and cached[0] == sig:
+            return cached[1], cached[2], cached[3]
+        nodes: Dict[str, TextNode] = {}
+        if retriever._use_flat(persist_dir):
+            store = retriever.get_flat_store(persist_dir)
+            for i in range(len(store)):
+                n = store.node(i)
+                nodes[n["id"]] = TextNode(id_=n["id"], text=n["text"], metadata=n["metadata"])
+        else:
+            nodes = dict(retriever.get_index(persist_dir).docstore.docs)
+        ids = list(nodes.keys())
+        with tracing.span("bm25_build", docs=len(ids)):
+            bm25 = BM25Index(nodes[i].get_content(metadata_mode="none") for i in ids)
+        _lexical[key] = (sig, nodes, ids, bm25)
+        return nodes, ids, bm25
+
+
+def rrf_merge(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Reciprocal rank fusion of several best-first id lists. [(id, fused score)] best first.
+    """
+    acc: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, node_id in enumerate(ranking):
+            acc[node_id] = acc.get(node_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(acc.items(), key=lambda x: -x[1])
+
+
+def _shingles(text: str, n: int = 5) -> set:
+    toks = tokenize(text)
+    if len(toks) < n:
+        return {tuple(toks)} if toks else set()
+    return {tuple(toks[i:i + n]) for i in range(len(toks) - n + 1)}
+
+
+def dedupe(nodes: List[NodeWithScore], max_overlap: float = DUP_OVERLAP) -> List[NodeWithScore]:
+    """
+    Drop chunks that repeat a higher-ranked one (same text indexed twice, or the
+    same passage from the md and main trees). Input and output are best first.
+    """
+    kept, seen = [], []
+    for nws in nodes:
+        sh = _shingles(nws.node.get_content(metadata_mode="none"))
+        if any(sh and prev and len(sh & prev) / min(len(sh), len(prev)) >= max_overlap for prev in seen):
+            continue
+        kept.append(nws)
+        seen.append(sh)
+    return kept
+
+
+def _get_reranker():
+    global _reranker
+    with _lock:
+        if _reranker is None:
+            from sentence_transformers import CrossEncoder
+            _reranker = CrossEncoder(RERANK_MODEL)
+        return _reranker
+
+
+def rerank(query: str, nodes: List[NodeWithScore]) -> List[NodeWithScore]:
+    """
+    Reorder fused candidates with the cross-encoder when RAG_RERANK_MODEL is set.
+    """
+    if not RERANK_MODEL or len(nodes) < 2:
+        return nodes
+    with tracing.span("rerank", n=len(nodes)):
+        scores = _get_reranker().predict([(query, n.node.get_content(metadata_mode="none")) for n in nodes])
+    ranked = sorted(zip(nodes, scores), key=lambda x: -float(x[1]))
+    return [NodeWithScore(node=n.node, score=float(s)) for n, s in ranked]
+
+
+def hybrid_retrieve_many(texts: List[str], k: int = 5, persist_dir: str = "rag_index",
+                         candidates: int = CANDIDATES) -> List[Response]:
+    """
+    Dense (batched, see retriever.retrieve_many) and BM25 candidates fused with RRF,
+    optionally reranked, deduplicated, and cut to k. Same Response shape as retrieve_many.
+    """
+    if not texts:
+        return []
+    t0 = time.perf_counter()
+    # unrecorded dense pass: the query stats below cover the whole fused retrieval
+    dense = retriever._retrieve_many(texts, max(k, candidates), persist_dir)
+    nodes, ids, bm25 = _lexical_index(persist_dir) if HYBRID else ({}, [], None)
+    out = []
+    for text, resp in zip(texts, dense):
+        by_id = {sn.node.node_id: sn.node for sn in resp.source_nodes}
+        rankings = [[sn.node.node_id for sn in resp.source_nodes]]
+        if bm25 is not None:
+            with tracing.span("bm25_search"):
+                lex = [ids[i] for i, _ in bm25.search(text, top_k=candidates)]
+            for node_id in lex:
+                by_id.setdefault(node_id, nodes[node_id])
+            rankings.append(lex)
+        fused = [NodeWithScore(node=by_id[i], score=s) for i, s in rrf_merge(rankings)]
+        fused = dedupe(rerank(text, fused))
+        out.append(Response(response=None, source_nodes=fused[:k]))
+    retriever.record_queries(len(texts), time.perf_counter() - t0)
+    return out
+
+
+def hybrid_query(text: str, k: int = 5, persist_dir: str = "rag_index") -> Response:
+    return hybrid_retrieve_many([text], k=k, persist_dir=persist_dir)[0]
+
+
+def pack_context(head: Sequence[str], chunks: List[Tuple[str, Dict]], budget: int = CONTEXT_TOKENS,
+                 count_tokens: Optional[Callable[[str], int]] = None) -> Tuple[str, int, List[Dict]]:
+    """
+    Catalog snippets from `head`, in order, while they fit in `budget` tokens, then as
+    many best-first (text, metadata) chunks as fit in what is left, labelled [CTX i].
+    Head snippets are kept whole and stop at the first that does not fit (they are in
+    priority order); chunks that do not fit are skipped so a shorter, lower-ranked one
+    can still use the remaining room.
+    Returns (context text, number of head snippets kept, metadata of the chunks kept).
+    """
+    count = count_tokens or approx_tokens
+    used = 0
+    parts: List[str] = []
+    for snippet in head:
+        n = count(snippet)
+        if used + n > budget:
+            break
+        parts.append(snippet)
+        used += n
+    n_head = len(parts)
+    kept = []
+    for text, meta in chunks:
+        block = f"[CTX {len(kept) + 1}] {text}"
+        n = count(block)
+        if used + n > budget:
+            continue
+        parts.append(block)
+        kept.append(meta)
+        used += n
+    return "\n\n".join(parts), n_head, kept
+
+
+def warm(persist_dir: str = "rag_index", k: int = 5):
+    """
+    retriever.warm plus the BM25 index over the same chunks.
+    """
+    out = retriever.warm(persist_dir=persist_dir, k=k)
+    if HYBRID:
+        _lexical_index(persist_dir)
+    return out
@@ -1,25 +1,144 @@
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex
-from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, load_index_from_storage
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 from llama_index.core import StorageContext
-import os
+from typing import Dict, List
+import os, sys, json, time
+
+# allow `python rag/ingest.py` from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rag.retriever import get_embed_model
+from rag.flat_store import FLAT_DIR, export_index
+from rag.embed_cache import file_sha256
 
 LAW_DIR = "files/laws/md"
 MAIN_DIR = "files/main"
 PERSIST_DIR = "rag_index"
+MANIFEST = "manifest.json"
+
+def _source_files() -> List[str]:
+    # same inputs SimpleDirectoryReader(LAW_DIR) + SimpleDirectoryReader(MAIN_DIR) used to load
+    out = []
+    for d in (LAW_DIR, MAIN_DIR):
+        if not os.path.isdir(d):
+            continue
+        for name in sorted(os.listdir(d)):
+            p = os.path.join(d, name)
+            if os.path.isfile(p) and not name.startswith("."):
+                out.append(p)
+    return out
+
+def _read_manifest(persist_dir: str) -> Dict:
+    p = os.path.join(persist_dir, MANIFEST)
+    if not os.path.exists(p):
+        return {"files": {}}
+    with open(p, "r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except Exception:
+            return {"files": {}}
+
+def _write_manifest(persist_dir: str, manifest: Dict) -> None:
+    p = os.path.join(persist_dir, MANIFEST)
+    tmp = p + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, p)
+
+def build_index(persist_dir: str = PERSIST_DIR, full: bool = False) -> Dict:
+    """
+    Incremental ingest: only new or changed source files are re-chunked and re-embedded,
+    deleted files have their nodes removed. Pass full=True to rebuild from scratch.
+    Writes rag_index/manifest.json with per-file hashes and the change summary.
+    """
+    t0 = time.perf_counter()
+    files = _source_files()
+    hashes = {p: file_sha256(p) for p in files}
+    manifest = _read_manifest(persist_dir)
+    has_index = os.path.exists(os.path.join(persist_dir, "docstore.json"))
+    # an index persisted before manifests existed can't be diffed, so rebuild it once
+    rebuild = full or not has_index or not manifest.get("files")
+    # deleted source files -> when, so run_batch.py --reaudit can find decisions that cited them
+    removed_at = dict(manifest.get("removed_at", {}))
+    prev_files = dict(manifest.get("files", {}))
+    if rebuild:
+        manifest = {"files": {}}
+    known = manifest.get("files", {})
 
-def build_index():
-    # Load documents (regulations + glossary)
-    docs_law = SimpleDirectoryReader(LAW_DIR).load_data()          
-    docs_main = SimpleDirectoryReader(MAIN_DIR).load_data()        
-    docs = docs_law + docs_main                                    
+    added = [p for p in files if p not in known]
+    changed = [p for p in files if p in known and known[p].get("sha256") != hashes[p]]
+    removed = [p for p in known if p not in hashes]
 
     splitter = SentenceSplitter(chunk_size=800, chunk_overlap=100)
-    embed = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
-    index = VectorStoreIndex.from_documents(docs, transformations=[splitter], embed_model=embed)
-    os.makedirs(PERSIST_DIR, exist_ok=True)
-    index.storage_context.persist(persist_dir=PERSIST_DIR)
+    embed = get_embed_model()
+    if rebuild:
+        index = VectorStoreIndex([], embed_model=embed)
+    else:
+        storage = StorageContext.from_defaults(persist_dir=persist_dir)
+        index = load_index_from_storage(storage, embed_model=embed)
+
+    # drop nodes of changed and deleted files before re-inserting
+    for p in changed + removed:
+        for doc_id in known[p].get("doc_ids", []):
+            index.delete_ref_doc(doc_id, delete_from_docstore=True)
+        known.pop(p, None)
+    now = time.time()
+    removed_at.update({p: now for p in removed})
+
+    todo = added + changed
+    if todo:
+        docs = SimpleDirectoryReader(input_files=todo, filename_as_id=True).load_data()
+        nodes = splitter.get_nodes_from_documents(docs)
+        index.insert_nodes(nodes)  # embeds only these nodes
+        doc_ids: Dict[str, List[str]] = {}
+        n_nodes: Dict[str, int] = {}
+        by_doc = {}
+        for d in docs:
+            src = _match_source(d.metadata.get("file_path", ""), todo)
+            doc_ids.setdefault(src, []).append(d.doc_id)
+            by_doc[d.doc_id] = src
+        for n in nodes:
+            src = by_doc.get(n.ref_doc_id)
+            n_nodes[src] = n_nodes.get(src, 0) + 1
+        for p in todo:
+            known[p] = {
+                "sha256": hashes[p],
+                "doc_ids": doc_ids.get(p, []),
+                "nodes": n_nodes.get(p, 0),
+                # a full rebuild re-chunks unchanged files; their content date stays as it was
+                "updated_at": prev_files[p].get("updated_at", now) if prev_files.get(p, {}).get("sha256") == hashes[p] else now,
+            }
+
+    os.makedirs(persist_dir, exist_ok=True)
+    index.storage_context.persist(persist_dir=persist_dir)
+    # memory-mapped copy for fast startup (RAG_BACKEND=flat/auto in rag.retriever)
+    n_flat = export_index(index, os.path.join(persist_dir, FLAT_DIR),
+                          quantize=os.environ.get("RAG_FLAT_QUANT") or None, embed_model="BAAI/bge-small-en-v1.5")
+    manifest = {
+        "built_at": time.time(),
+        "embed_model": "BAAI/bge-small-en-v1.5",
+        "splitter": {"chunk_size": 800, "chunk_overlap": 100},
+        "files": known,
+        "removed_at": removed_at,
+        "flat_rows": n_flat,
+        "last_run": {
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+            "unchanged": len(files) - len(added) - len(changed),
+            "elapsed_s": round(time.perf_counter() - t0, 2),
+        },
+    }
+    _write_manifest(persist_dir, manifest)
+    print(f"ingest: +{len(added)} ~{len(changed)} -{len(removed)} ={manifest['last_run']['unchanged']} "
+          f"({manifest['last_run']['elapsed_s']}s)")
+    return manifest
+
+def _match_source(file_path: str, candidates: List[str]) -> str:
+    fp = os.path.abspath(file_path)
+    for p in candidates:
+        if os.path.abspath(p) == fp:
+            return p
+    return file_path
 
 if __name__ == "__main__":
-    build_index()
\ No newline at end of file
+    build_index(full="--full" in sys.argv)
@@ -1,16 +1,263 @@
+import os, threading, time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from llama_index.core import load_index_from_storage, StorageContext
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.base.response.schema import Response
 from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from rag.embed_cache import EmbeddingCache, text_key
+from rag.flat_store import FLAT_DIR, FlatStore
+from agents import tracing
+
+try:
+    from llama_index.embeddings.huggingface.utils import format_query
+except ImportError:  # older/newer package layouts: fall back to the raw query text
+    def format_query(query, model_name=None, instruction=None):
+        return query
+
+EMBED_MODEL_ID = "BAAI/bge-small-en-v1.5"
+# "llama": llama-index JSON store; "flat": memory-mapped FlatStore written by ingest;
+# "auto": flat when rag_index/flat exists, else llama
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "auto")
+
+_lock = threading.RLock()
+_embed = None
+_embed_cache: Optional[EmbeddingCache] = None
+# persist_dir -> (index files signature, index)
+_indexes: Dict[str, Tuple[tuple, object]] = {}
+# (persist_dir, k) -> (index files signature, query engine)
+_engines: Dict[Tuple[str, int], Tuple[tuple, object]] = {}
+# persist_dir -> (index files signature, node ids, L2-normalized embedding matrix)
+_dense: Dict[str, Tuple[tuple, List[str], np.ndarray]] = {}
+# persist_dir -> (flat store files signature, FlatStore)
+_flat: Dict[str, Tuple[tuple, FlatStore]] = {}
+_stats = {
+    "loads": 0, "load_s_total": 0.0, "load_s_last": 0.0,
+    "cache_hits": 0,
+    "queries": 0, "query_s_total": 0.0, "query_s_last": 0.0,
+}
+
+def get_embed_model():
+    global _embed
+    with _lock:
+        if _embed is None:
+            _embed = HuggingFaceEmbedding(model_name=EMBED_MODEL_ID)
+        return _embed
+
+def _get_embed_cache() -> EmbeddingCache:
+    global _embed_cache
+    with _lock:
+        if _embed_cache is None:
+            _embed_cache = EmbeddingCache()
+        return _embed_cache
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(m, axis=-1, keepdims=True)
+    n[n == 0] = 1.0
+    return m / n
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """
+    Document-side embeddings, L2-normalized, through the text-hash cache.
+    """
+    keys = [text_key(EMBED_MODEL_ID, "text", t) for t in texts]
+    return _normalize(_get_embed_cache().get_many(keys, texts, get_embed_model().get_text_embedding_batch))
+
+def embed_queries(texts: List[str]) -> np.ndarray:
+    """
+    Query-side embeddings (bge query instruction applied), one batch for all cache misses.
+    """
+    keys = [text_key(EMBED_MODEL_ID, "query", t) for t in texts]
+    embed = get_embed_model()
+    fn = lambda batch: embed.get_text_embedding_batch([format_query(t, EMBED_MODEL_ID) for t in batch])
+    with tracing.span("embed_query", n=len(texts)):
+        return _normalize(_get_embed_cache().get_many(keys, texts, fn))
+
+def _index_signature(persist_dir: str) -> tuple:
+    """
+    (name, mtime_ns, size) of every persisted index file; changes when ingest rewrites the index.
+    """
+    sig = []
+    if os.path.isdir(persist_dir):
+        for name in sorted(os.listdir(persist_dir)):
+            p = os.path.join(persist_dir, name)
+            if os.path.isfile(p):
+                st = os.stat(p)
+                sig.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(sig)
+
+def get_index(persist_dir="rag_index"):
+    """
+    Process-wide index per persist_dir, reloaded only when its files on disk change.
+    """
+    key = os.path.abspath(persist_dir)
+    sig = _index_signature(persist_dir)
+    with _lock:
+        cached = _indexes.get(key)
+        if cached and cached[0] == sig:
+            _stats["cache_hits"] += 1
+            return cached[1]
+        t0 = time.perf_counter()
+        with tracing.span("retriever_load", backend="llama"):
+            storage = StorageContext.from_defaults(persist_dir=persist_dir)
+            index = load_index_from_storage(storage, embed_model=get_embed_model())
+        dt = time.perf_counter() - t0
+        _indexes[key] = (sig, index)
+        _stats["loads"] += 1
+        _stats["load_s_total"] += dt
+        _stats["load_s_last"] = dt
+        return index
 
 def get_retriever(persist_dir="rag_index", k=5):
-    storage = StorageContext.from_defaults(persist_dir=persist_dir)
-    embed = HuggingFaceEmbedding(model_name="BAAI/bge-small-en-v1.5")
-    index = load_index_from_storage(storage, embed_model=embed)
-    # response_mode="no_text" returns sources which is good for RAG grounding
-    return index.as_query_engine(similarity_top_k=k, response_mode="no_text")
+    """
+    Process-wide query engine, memoized per (persist_dir, k).
+    The index is reloaded only when its files on disk change.
+    """
+    key = (os.path.abspath(persist_dir), k)
+    with _lock:
+        index = get_index(persist_dir)
+        sig = _indexes[key[0]][0]
+        cached = _engines.get(key)
+        if cached and cached[0] == sig:
+            return cached[1]
+        # response_mode="no_text" returns sources which is good for RAG grounding
+        engine = index.as_query_engine(similarity_top_k=k, response_mode="no_text")
+        _engines[key] = (sig, engine)
+        return engine
+
+def _dense_matrix(persist_dir: str) -> Optional[Tuple[List[str], np.ndarray]]:
+    """
+    Node ids and normalized embedding matrix of the persisted vector store, or None
+    when the store does not expose its embeddings (then we fall back to the query engine).
+    """
+    index = get_index(persist_dir)
+    key = os.path.abspath(persist_dir)
+    with _lock:
+        sig = _indexes[key][0]
+        cached = _dense.get(key)
+        if cached and cached[0] == sig:
+            return cached[1], cached[2]
+        data = getattr(getattr(index, "vector_store", None), "data", None)
+        emb = getattr(data, "embedding_dict", None)
+        if not emb:
+            return None
+        ids = list(emb.keys())
+        mat = _normalize(np.asarray([emb[i] for i in ids], dtype=np.float32))
+        _dense[key] = (sig, ids, mat)
+        return ids, mat
+
+def _use_flat(persist_dir: str) -> bool:
+    if RAG_BACKEND == "flat":
+        return True
+    return RAG_BACKEND == "auto" and os.path.exists(os.path.join(persist_dir, FLAT_DIR, "meta.json"))
+
+def get_flat_store(persist_dir="rag_index") -> FlatStore:
+    """
+    Memory-mapped store under persist_dir/flat, remapped only when its files change.
+    """
+    path = os.path.join(persist_dir, FLAT_DIR)
+    key = os.path.abspath(path)
+    sig = _index_signature(path)
+    with _lock:
+        cached = _flat.get(key)
+        if cached and cached[0] == sig:
+            _stats["cache_hits"] += 1
+            return cached[1]
+        t0 = time.perf_counter()
+        with tracing.span("retriever_load", backend="flat"):
+            store = FlatStore(path)
+        dt = time.perf_counter() - t0
+        _flat[key] = (sig, store)
+        _stats["loads"] += 1
+        _stats["load_s_total"] += dt
+        _stats["load_s_last"] = dt
+        return store
+
+def _retrieve_flat(texts: List[str], k: int, persist_dir: str) -> List[Response]:
+    store = get_flat_store(persist_dir)
+    q = embed_queries(texts)
+    with tracing.span("vector_search", backend="flat", rows=len(store)):
+        top, scores = store.search(q, k=k)
+    out = []
+    for row_idx, row_scores in zip(top, scores):
+        nodes = []
+        for i, sc in zip(row_idx, row_scores):
+            n = store.node(int(i))
+            nodes.append(NodeWithScore(node=TextNode(id_=n["id"], text=n["text"], metadata=n["metadata"]), score=float(sc)))
+        out.append(Response(response=None, source_nodes=nodes))
+    return out
+
+def record_queries(n: int, seconds: float) -> None:
+    # query stats for retriever_stats(); a batch of n queries counts as n, each taking seconds / n
+    if n <= 0:
+        return
+    with _lock:
+        _stats["queries"] += n
+        _stats["query_s_total"] += seconds
+        _stats["query_s_last"] = seconds / n
+
+def retrieve_many(texts: List[str], k: int = 5, persist_dir="rag_index") -> List[Response]:
+    """
+    Bulk retrieval: all queries are embedded in one batch and scored with a single
+    matmul against the index matrix. Returns one no-text Response per query,
+    like the query engine does.
+    """
+    t0 = time.perf_counter()
+    out = _retrieve_many(texts, k, persist_dir)
+    record_queries(len(texts), time.perf_counter() - t0)
+    return out
+
+def _retrieve_many(texts: List[str], k: int, persist_dir: str) -> List[Response]:
+    if not texts:
+        return []
+    if _use_flat(persist_dir):
+        return _retrieve_flat(texts, k, persist_dir)
+    dense = _dense_matrix(persist_dir)
+    if dense is None:
+        qe = get_retriever(persist_dir=persist_dir, k=k)
+        return [qe.query(t) for t in texts]
+    ids, mat = dense
+    q = embed_queries(texts)
+    with tracing.span("vector_search", backend="llama", rows=len(ids)):
+        sims = q @ mat.T
+        kk = min(k, len(ids))
+        top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk] if kk else np.zeros((len(texts), 0), dtype=int)
+    docstore = get_index(persist_dir).docstore
+    out = []
+    for row, cand in enumerate(top):
+        cand = cand[np.argsort(-sims[row, cand])]
+        nodes = docstore.get_nodes([ids[i] for i in cand])
+        out.append(Response(
+            response=None,
+            source_nodes=[NodeWithScore(node=n, score=float(sims[row, i])) for n, i in zip(nodes, cand)],
+        ))
+    return out
+
+def warm(persist_dir="rag_index", k=5):
+    """
+    Load the embedding model and index up front (e.g. at batch/daemon startup).
+    """
+    get_embed_model()
+    if _use_flat(persist_dir):
+        return get_flat_store(persist_dir)
+    _dense_matrix(persist_dir)
+    return get_retriever(persist_dir=persist_dir, k=k)
+
+def query(text: str, persist_dir="rag_index", k=5):
+    return retrieve_many([text], k=k, persist_dir=persist_dir)[0]
+
+def retriever_stats() -> dict:
+    with _lock:
+        out = dict(_stats)
+        out["cached_engines"] = len(_engines)
+        out["backend"] = RAG_BACKEND
+        out["embed_cache"] = _embed_cache.stats() if _embed_cache else None
+    out["query_s_avg"] = out["query_s_total"] / out["queries"] if out["queries"] else 0.0
+    return out
 
 def format_sources(resp):
     texts, metas = [], []
     for i, sn in enumerate(resp.source_nodes):
         texts.append(f"[CTX {i+1}] " + sn.node.get_content(metadata_mode="none"))
         metas.append(dict(sn.node.metadata or {}))
-    return "\n\n".join(texts), metas
\ No newline at end of file
+    return "\n\n".join(texts), metas
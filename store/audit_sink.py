@@ -0,0 +1,382 @@
+import os, io, re, csv, sys, json, glob, gzip, time, queue, fcntl, atexit, shutil, threading
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# "batch": fsync after every group commit; "interval": at most every AUDIT_FSYNC_MS; "none": leave it to the OS
+AUDIT_FSYNC = os.environ.get("AUDIT_FSYNC", "batch")
+AUDIT_FSYNC_MS = float(os.environ.get("AUDIT_FSYNC_MS", "1000"))
+# the active file is rotated into a numbered, compressed segment past either limit (0 = off)
+AUDIT_ROTATE_MB = float(os.environ.get("AUDIT_ROTATE_MB", "64"))
+AUDIT_ROTATE_S = float(os.environ.get("AUDIT_ROTATE_S", "0"))
+# "gzip", "zstd" (falls back to gzip without the zstandard package) or "none"
+AUDIT_COMPRESS = os.environ.get("AUDIT_COMPRESS", "gzip")
+# record format of the JSON audit log: "jsonl" or "msgpack" (needs the msgpack package)
+AUDIT_FORMAT = os.environ.get("AUDIT_FORMAT", "jsonl")
+# rows a writer takes off the queue per commit, and how many may wait before append() blocks
+AUDIT_BATCH = int(os.environ.get("AUDIT_BATCH", "1000"))
+AUDIT_QUEUE = int(os.environ.get("AUDIT_QUEUE", "10000"))
+
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+
+def _segments(path: str) -> List[Tuple[int, str]]:
+    # closed segments of `path` as (seq, file), oldest first: outputs.csv -> outputs.000003.csv.gz
+    base, ext = os.path.splitext(path)
+    seg_re = re.compile(r"^\.(\d{6})" + re.escape(ext) + r"(\.gz|\.zst)?$")
+    found = []
+    for p in glob.glob(glob.escape(base) + ".[0-9][0-9][0-9][0-9][0-9][0-9]" + glob.escape(ext) + "*"):
+        m = seg_re.match(p[len(base):])
+        if m:
+            found.append((int(m.group(1)), p))
+    return sorted(found)
+
+
+def _compress(src: str, method: str) -> str:
+    if method == "zstd" and _zstd() is not None:
+        dst, opener = src + ".zst", lambda p: _zstd().ZstdCompressor(level=3).stream_writer(open(p, "wb"))
+    elif method in ("gzip", "zstd"):
+        dst, opener = src + ".gz", lambda p: gzip.open(p, "wb", compresslevel=6)
+    else:
+        return src
+    tmp = dst + ".tmp"
+    with open(src, "rb") as fin, opener(tmp) as fout:
+        shutil.copyfileobj(fin, fout, 1 << 20)
+    os.replace(tmp, dst)
+    os.remove(src)
+    return dst
+
+
+class AuditSink:
+    """
+    Append-only log fed through a queue and written by one background thread.
+    Each commit takes everything queued (up to AUDIT_BATCH rows), encodes it and
+    appends it with a single write under an exclusive flock, then fsyncs per
+    AUDIT_FSYNC, so rows from concurrent threads and processes never interleave.
+    The active file keeps its name. Past AUDIT_ROTATE_MB / AUDIT_ROTATE_S it is
+    renamed to the next numbered segment and compressed in the background.
+    fmt is "jsonl", "msgpack" or "csv" (fieldnames required; header per file).
+    transform, if given, maps each row to the record written, on the writer thread.
+    A row that fails to transform or encode goes to <path>.rejected.jsonl; a failed
+    write is cut back and retried with backoff, keeping its rows (see flush()).
+    """
+
+    def __init__(self, path: str, fmt: str = "jsonl", fieldnames: Optional[List[str]] = None,
+                 transform: Optional[Callable[[Dict], Dict]] = None, fsync: str = AUDIT_FSYNC,
+                 rotate_mb: float = AUDIT_ROTATE_MB, rotate_s: float = AUDIT_ROTATE_S, compress: str = AUDIT_COMPRESS):
+        if fmt == "csv" and not fieldnames:
+            raise ValueError("csv audit sink needs fieldnames")
+        if fmt == "msgpack":
+            import msgpack  # optional dependency, only for AUDIT_FORMAT=msgpack
+            self._packer = msgpack.Packer(default=str, use_bin_type=True)
+        self.path = path
+        self.fmt = fmt
+        self.fieldnames = fieldnames
+        self.transform = transform
+        self.fsync = fsync
+        self.rotate_bytes = int(rotate_mb * 1024 * 1024) if rotate_mb > 0 else 0
+        self.rotate_s = rotate_s
+        self.compress = compress
+        self.reject_path = path + ".rejected.jsonl"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, AUDIT_QUEUE))
+        self._fd: Optional[int] = None
+        self._opened_at = 0.0
+        self._last_fsync = time.monotonic()
+        self._dirty = False
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._done = 0  # rows written or rejected
+        self._unreported_rejects = 0
+        self._io_failures = 0
+        self._closed = False
+        self._compressors: List[threading.Thread] = []
+        self._stats = {"rows": 0, "commits": 0, "bytes": 0, "fsyncs": 0, "rotations": 0, "errors": 0, "rejected": 0}
+        self._worker = threading.Thread(target=self._run, name=f"audit-sink:{os.path.basename(path)}", daemon=True)
+        self._worker.start()
+
+    # ---- producer side ----
+    def append(self, row: Dict) -> None:
+        """
+        Queue one record; returns once queued (blocks only when AUDIT_QUEUE rows are waiting).
+        """
+        if self._closed:
+            raise ValueError(f"audit sink {self.path} is closed")
+        # shallow copy: callers keep mutating their result dicts (e.g. the persist trace span)
+        with self._cond:
+            self._enqueued += 1
+        self._queue.put(dict(row))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every record appended so far is written (and fsynced unless
+        AUDIT_FSYNC=none). False on timeout, when a write failed (the rows are kept
+        and retried in the background), or when rows were rejected since the last flush.
+        """
+        with self._cond:
+            target = self._enqueued
+            failures = self._io_failures
+            self._cond.wait_for(lambda: self._done >= target or self._io_failures > failures, timeout=timeout)
+            if self._done < target:
+                return False
+            rejected, self._unreported_rejects = self._unreported_rejects, 0
+            return rejected == 0
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        for t in self._compressors:
+            t.join()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return dict(self._stats, queued=self._queue.qsize(), path=self.path, fmt=self.fmt)
+
+    # ---- writer thread ----
+    def _header(self) -> bytes:
+        if self.fmt != "csv":
+            return b""
+        buf = io.StringIO()
+        csv.DictWriter(buf, fieldnames=self.fieldnames).writeheader()
+        return buf.getvalue().encode("utf-8")
+
+    def _encode_row(self, row: Dict) -> bytes:
+        # one row at a time, so a row the transform or encoder chokes on fails alone
+        if self.transform is not None:
+            row = self.transform(row)
+        if self.fmt == "msgpack":
+            return self._packer.pack(row)
+        if self.fmt == "csv":
+            buf = io.StringIO()
+            csv.DictWriter(buf, fieldnames=self.fieldnames, extrasaction="ignore").writerow(row)
+            return buf.getvalue().encode("utf-8")
+        return (json.dumps(row, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+    def _reject(self, row: Dict, err: Exception) -> None:
+        # dead letter: the raw row and the error, next to the log, for a manual replay
+        self._stats["rejected"] += 1
+        print(f"X audit sink {self.path}: row rejected ({type(err).__name__}: {err}), see {self.reject_path}", file=sys.stderr)
+        try:
+            with open(self.reject_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"error": f"{type(err).__name__}: {err}", "row": row}, ensure_ascii=False, default=str) + "\n")
+        except Exception as e:
+            print(f"X audit sink {self.reject_path}: {e}", file=sys.stderr)
+
+    def _open(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._opened_at = time.time()
+
+    def _ensure_current(self) -> None:
+        # another process may have rotated the file since our last commit; called under the flock
+        try:
+            same = self._fd is not None and os.fstat(self._fd).st_ino == os.stat(self.path).st_ino
+        except FileNotFoundError:
+            same = False
+        if not same:
+            self._open()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def _do_fsync(self) -> None:
+        if self._fd is not None and self._dirty:
+            os.fsync(self._fd)
+            self._dirty = False
+            self._last_fsync = time.monotonic()
+            self._stats["fsyncs"] += 1
+
+    def _rotate(self) -> None:
+        # called under the flock, after the last write to the active file
+        segs = _segments(self.path)
+        base, ext = os.path.splitext(self.path)
+        seg = f"{base}.{(segs[-1][0] + 1) if segs else 1:06d}{ext}"
+        self._do_fsync()
+        os.rename(self.path, seg)
+        self._stats["rotations"] += 1
+        if self.compress != "none":
+            t = threading.Thread(target=_compress, args=(seg, self.compress), name="audit-compress")
+            t.start()
+            self._compressors = [c for c in self._compressors if c.is_alive()] + [t]
+
+    def _commit(self, chunks: List[bytes]) -> None:
+        if self._fd is None:
+            self._open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._ensure_current()
+            size = os.fstat(self._fd).st_size
+            data = (self._header() if size == 0 else b"") + b"".join(chunks)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(self._fd, view):]
+                self._dirty = True
+                if self.fsync == "batch" or (self.fsync == "interval" and (time.monotonic() - self._last_fsync) * 1000.0 >= AUDIT_FSYNC_MS):
+                    self._do_fsync()
+            except OSError:
+                # cut a partial group back off so the retry does not leave half a line behind
+                os.ftruncate(self._fd, size)
+                raise
+            self._stats["bytes"] += len(data)
+            self._stats["rows"] += len(chunks)
+            self._stats["commits"] += 1
+            size += len(data)
+            if (self.rotate_bytes and size >= self.rotate_bytes) or (self.rotate_s and time.time() - self._opened_at >= self.rotate_s):
+                self._rotate()
+        finally:
+            if self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _take(self, timeout: Optional[float]) -> Tuple[List[Dict], bool]:
+        # up to AUDIT_BATCH queued rows, waiting at most `timeout` for the first; (rows, stop seen)
+        rows: List[Dict] = []
+        try:
+            item = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return rows, False
+        while item is not None:
+            rows.append(item)
+            if len(rows) >= AUDIT_BATCH:
+                return rows, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows, False
+        return rows, True
+
+    def _run(self) -> None:
+        pending: List[bytes] = []  # encoded rows kept across failed commits until one succeeds
+        delay = 0.0
+        stop = False
+        while not (stop and not pending):
+            rows: List[Dict] = []
+            if not stop and len(pending) < AUDIT_QUEUE:
+                # while retrying, come back after the backoff even if nothing new arrives;
+                # when idle, wake up now and then so "interval" fsyncs happen
+                timeout = delay if pending else (AUDIT_FSYNC_MS / 1000.0 if self.fsync == "interval" else None)
+                rows, stop = self._take(timeout)
+            elif not stop:
+                time.sleep(delay)
+            if not rows and not pending:
+                self._do_fsync()
+                continue
+            rejected = 0
+            for r in rows:
+                try:
+                    pending.append(self._encode_row(r))
+                except Exception as e:
+                    self._reject(r, e)
+                    rejected += 1
+            written = 0
+            if pending:
+                try:
+                    self._commit(pending)
+                    written, pending, delay = len(pending), [], 0.0
+                except Exception as e:
+                    self._stats["errors"] += 1
+                    delay = min(5.0, max(0.1, delay * 2))
+                    print(f"X audit sink {self.path}: {e}; {len(pending)} row(s) kept, retrying in {delay:.1f}s", file=sys.stderr)
+                    if stop:
+                        print(f"X audit sink {self.path}: closing with {len(pending)} row(s) unwritten", file=sys.stderr)
+                        pending = []
+            with self._cond:
+                self._done += written + rejected
+                self._unreported_rejects += rejected
+                self._io_failures += int(written == 0 and bool(pending))
+                self._cond.notify_all()
+        if self._fd is not None:
+            try:
+                self._do_fsync()
+            finally:
+                os.close(self._fd)
+                self._fd = None
+
+
+_sinks: Dict[str, AuditSink] = {}
+_sinks_lock = threading.Lock()
+
+
+def get_sink(path: str, fmt: str = "jsonl", fieldnames: Optional[List[str]] = None,
+             transform: Optional[Callable[[Dict], Dict]] = None) -> AuditSink:
+    """
+    Process-wide sink per file; all are flushed and closed at interpreter exit.
+    """
+    key = os.path.abspath(path)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None:
+            sink = _sinks[key] = AuditSink(path, fmt=fmt, fieldnames=fieldnames, transform=transform)
+        return sink
+
+
+def flush_all(timeout: Optional[float] = None) -> bool:
+    """
+    flush() every sink; True only if all of them succeeded.
+    """
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+    return all([s.flush(timeout) for s in sinks])
+
+
+@atexit.register
+def _close_all() -> None:
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+        _sinks.clear()
+    for s in sinks:
+        s.close()
+
+
+def _open_text(p: str):
+    if p.endswith(".gz"):
+        return gzip.open(p, "rt", encoding="utf-8", newline="")
+    if p.endswith(".zst"):
+        return io.TextIOWrapper(_zstd().ZstdDecompressor().stream_reader(open(p, "rb")), encoding="utf-8", newline="")
+    return open(p, "r", encoding="utf-8", newline="")
+
+
+def _open_binary(p: str):
+    if p.endswith(".gz"):
+        return gzip.open(p, "rb")
+    if p.endswith(".zst"):
+        return _zstd().ZstdDecompressor().stream_reader(open(p, "rb"))
+    return open(p, "rb")
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream every record of a sink back, closed segments (oldest first) then the
+    active file. fmt defaults to the file extension (.csv, .msgpack, else jsonl).
+    CSV values come back as strings.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    fmt = fmt or {".csv": "csv", ".msgpack": "msgpack"}.get(ext, "jsonl")
+    files = [p for _, p in _segments(path)] + ([path] if os.path.exists(path) else [])
+    for p in files:
+        if fmt == "msgpack":
+            import msgpack
+            with _open_binary(p) as f:
+                yield from msgpack.Unpacker(f, raw=False)
+        elif fmt == "csv":
+            csv.field_size_limit(sys.maxsize)  # retrieval_sources blobs can be large
+            with _open_text(p) as f:
+                yield from csv.DictReader(f)
+        else:
+            with _open_text(p) as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+if __name__ == "__main__":
+    # python -m store.audit_sink data/audit_log.jsonl  -> dump all segments as JSON lines
+    for rec in read_records(sys.argv[1] if len(sys.argv) > 1 else "data/audit_log.jsonl"):
+        print(json.dumps(rec, ensure_ascii=False, default=str))
@@ -0,0 +1,141 @@
+import os, threading
+from typing import List, Optional, Tuple
+import numpy as np
+from rag.embed_cache import flocked
+
+try:  # optional ANN backend; brute-force NumPy is fine up to ~1e5 decisions
+    import faiss
+except ImportError:
+    faiss = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INDEX_DIR = os.environ.get("DECISION_INDEX_DIR", os.path.join(PROJECT_ROOT, "data", "decision_index"))
+# cosine similarity at or above which a prior audited verdict is reused instead of re-running the committee
+REUSE_SIM = float(os.environ.get("DECISION_REUSE_SIM", "0.97"))
+
+
+def embed_feature(text: str) -> np.ndarray:
+    # same bge-small model (and embedding cache) the retriever uses, L2-normalized so dot product == cosine
+    from rag.retriever import embed_texts
+    return embed_texts([text])[0]
+
+
+class DecisionIndex:
+    """
+    Persistent vector index over classified features.
+    vectors.f32 is an append-only float32 matrix, ids.txt the matching decision ids,
+    dim.txt the row width. Appends hold an exclusive flock on index.lock, so processes
+    sharing the directory cannot interleave a vector with another process's id.
+    """
+
+    def __init__(self, path: str = INDEX_DIR):
+        os.makedirs(path, exist_ok=True)
+        self.vec_path = os.path.join(path, "vectors.f32")
+        self.ids_path = os.path.join(path, "ids.txt")
+        self.dim_path = os.path.join(path, "dim.txt")
+        self.lock_path = os.path.join(path, "index.lock")
+        self._lock = threading.Lock()
+        self.ids: List[int] = []
+        self.dim: Optional[int] = None
+        self._mat = np.zeros((0, 0), dtype=np.float32)
+        with flocked(self.lock_path):
+            self._load()
+        self._faiss = None
+        self._pending: List[np.ndarray] = []
+
+    def _load(self) -> None:
+        ids: List[int] = []
+        if os.path.exists(self.ids_path):
+            with open(self.ids_path, "r", encoding="utf-8") as f:
+                ids = [int(x) for x in f.read().split()]
+        size = os.path.getsize(self.vec_path) if os.path.exists(self.vec_path) else 0
+        if os.path.exists(self.dim_path):
+            with open(self.dim_path, "r", encoding="utf-8") as f:
+                self.dim = int(f.read().strip())
+        elif ids and size and size % (4 * len(ids)) == 0:
+            # index written before dim.txt existed; only trust the width if the files agree
+            self.dim = size // 4 // len(ids)
+            with open(self.dim_path, "w", encoding="utf-8") as f:
+                f.write(str(self.dim))
+        if self.dim is None:
+            if ids or size:
+                print(f"X decision index {self.ids_path}: row width unknown, starting empty")
+                for p in (self.vec_path, self.ids_path):
+                    if os.path.exists(p):
+                        os.remove(p)
+            return
+        n = min(len(ids), size // 4 // self.dim)
+        # a crash mid-append can leave the two files out of step; cut both back to n rows
+        if size != n * self.dim * 4:
+            with open(self.vec_path, "r+b") as f:
+                f.truncate(n * self.dim * 4)
+        if n != len(ids):
+            with open(self.ids_path, "w", encoding="utf-8") as f:
+                f.write("".join(f"{i}\n" for i in ids[:n]))
+        self.ids = ids[:n]
+        if n:
+            self._mat = np.fromfile(self.vec_path, dtype=np.float32, count=n * self.dim).reshape(n, self.dim)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, decision_id: int, vec: np.ndarray) -> None:
+        vec = np.asarray(vec, dtype=np.float32).reshape(-1)
+        with self._lock, flocked(self.lock_path):
+            if self.dim is None:
+                if os.path.exists(self.dim_path):  # another process created the index meanwhile
+                    with open(self.dim_path, "r", encoding="utf-8") as f:
+                        self.dim = int(f.read().strip())
+                else:
+                    self.dim = vec.shape[0]
+                    with open(self.dim_path, "w", encoding="utf-8") as f:
+                        f.write(str(self.dim))
+            if vec.shape[0] != self.dim:
+                raise ValueError(f"decision index holds {self.dim}-d vectors, got {vec.shape[0]}")
+            with open(self.vec_path, "ab") as f:
+                f.write(vec.tobytes())
+            with open(self.ids_path, "a", encoding="utf-8") as f:
+                f.write(f"{decision_id}\n")
+            self.ids.append(decision_id)
+            if self._faiss is not None:
+                self._faiss.add(vec[None, :])
+            else:
+                self._pending.append(vec)
+
+    def _matrix(self) -> np.ndarray:
+        if self._pending:
+            self._mat = np.vstack([self._mat.reshape(-1, self.dim)] + [p[None, :] for p in self._pending])
+            self._pending = []
+        return self._mat
+
+    def search(self, vec: np.ndarray, k: int = 5) -> List[Tuple[int, float]]:
+        """
+        [(decision_id, cosine similarity)] best first.
+        """
+        with self._lock:
+            if not self.ids:
+                return []
+            q = np.asarray(vec, dtype=np.float32).reshape(1, -1)
+            k = min(k, len(self.ids))
+            if faiss is not None:
+                if self._faiss is None:
+                    self._faiss = faiss.IndexFlatIP(self.dim)
+                    self._faiss.add(self._matrix())
+                    self._pending = []
+                sims, idx = self._faiss.search(q, k)
+                return [(self.ids[i], float(s)) for i, s in zip(idx[0], sims[0]) if i >= 0]
+            sims = self._matrix() @ q[0]
+            top = np.argpartition(-sims, k - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+            return [(self.ids[i], float(sims[i])) for i in top]
+
+
+_index: Optional[DecisionIndex] = None
+_index_lock = threading.Lock()
+
+def get_decision_index() -> DecisionIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DecisionIndex()
+        return _index
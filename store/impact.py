@@ -0,0 +1,74 @@
+import os, re, json, time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from catalog.changes import changes_since
+from store.results import PROJECT_ROOT, ResultsStore, get_store
+
+INDEX_MANIFEST = os.path.join(PROJECT_ROOT, "rag_index", "manifest.json")
+
+_REL_RE = re.compile(r"^(\d+(?:\.\d+)?)([smhdw])$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_since(value: str) -> float:
+    """
+    Epoch seconds from "1760000000", an ISO date/datetime ("2026-10-01",
+    "2026-10-01T09:30") or a look-back ("36h", "7d").
+    """
+    v = value.strip()
+    m = _REL_RE.match(v)
+    if m:
+        return time.time() - float(m.group(1)) * _UNITS[m.group(2)]
+    try:
+        return float(v)
+    except ValueError:
+        return datetime.fromisoformat(v).timestamp()
+
+
+def changed_sources_since(since: float, manifest_path: str = INDEX_MANIFEST) -> Dict[str, float]:
+    """
+    {file name: changed_at} for RAG sources re-ingested or deleted at or after `since`,
+    from the per-file updated_at / removed_at in rag_index/manifest.json.
+    """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    stamps = [(p, meta.get("updated_at")) for p, meta in manifest.get("files", {}).items()]
+    stamps += list(manifest.get("removed_at", {}).items())
+    out: Dict[str, float] = {}
+    for p, ts in stamps:
+        if ts is not None and ts >= since:
+            name = os.path.basename(p)
+            out[name] = max(ts, out.get(name, 0.0))
+    return out
+
+
+def _priority(d: Dict) -> Tuple:
+    # changed catalog rules were quoted verbatim in the prompt, retrieved chunks and new
+    # laws in a jurisdiction are looser evidence; then least confident verdicts first
+    evidence = 2 * len(d["rules"]) + len(d["sources"]) + len(d["jurisdictions"])
+    conf = d.get("confidence")
+    return (-evidence, conf if conf is not None else 0.0, d["decision_id"])
+
+
+def plan_reaudit(since: float, store: Optional[ResultsStore] = None,
+                 manifest_path: str = INDEX_MANIFEST) -> Tuple[List[Dict], Dict]:
+    """
+    Decisions to re-run because catalog rules or RAG sources they used changed after
+    `since` (and after the decision was made), highest priority first, plus a summary.
+    """
+    store = store or get_store()
+    rules, jurisdictions = changes_since(since)
+    sources = changed_sources_since(since, manifest_path)
+    targets = sorted(store.affected_decisions(rules, sources, jurisdictions), key=_priority)
+    summary = {
+        "since": since,
+        "changed_rules": len(rules),
+        "changed_jurisdictions": sorted(jurisdictions),
+        "changed_sources": sorted(sources),
+        "affected": len(targets),
+        # decisions stored before feature_description was recorded cannot be re-run
+        "missing_description": sum(1 for t in targets if not t.get("feature_description")),
+    }
+    return targets, summary
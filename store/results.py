@@ -0,0 +1,271 @@
+import os, sys, json, sqlite3, threading
+from typing import Dict, Iterable, List, Optional, Set
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DB = os.environ.get("RESULTS_DB", os.path.join(PROJECT_ROOT, "data", "results.sqlite"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS decisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    feature_name TEXT NOT NULL,
+    needs_geo_compliance INTEGER NOT NULL,
+    confidence REAL,
+    timestamp REAL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS decisions_feature ON decisions(feature_name);
+CREATE TABLE IF NOT EXISTS decision_regs (
+    reg TEXT NOT NULL,
+    decision_id INTEGER NOT NULL REFERENCES decisions(id)
+);
+CREATE INDEX IF NOT EXISTS decision_regs_reg ON decision_regs(reg, decision_id);
+CREATE TABLE IF NOT EXISTS decision_rules (
+    rule_id TEXT NOT NULL,
+    decision_id INTEGER NOT NULL REFERENCES decisions(id)
+);
+CREATE INDEX IF NOT EXISTS decision_rules_rule ON decision_rules(rule_id, decision_id);
+CREATE TABLE IF NOT EXISTS decision_sources (
+    source TEXT NOT NULL,
+    decision_id INTEGER NOT NULL REFERENCES decisions(id)
+);
+CREATE INDEX IF NOT EXISTS decision_sources_source ON decision_sources(source, decision_id);
+CREATE TABLE IF NOT EXISTS decision_jurisdictions (
+    jurisdiction TEXT NOT NULL,
+    decision_id INTEGER NOT NULL REFERENCES decisions(id)
+);
+CREATE INDEX IF NOT EXISTS decision_jurisdictions_j ON decision_jurisdictions(jurisdiction, decision_id);
+"""
+# bumped when an index table is added, so existing databases get it backfilled once
+_SCHEMA_VERSION = 2
+# SQLite's default limit on bound parameters is 999
+_IN_CHUNK = 500
+
+
+def _as_list(v) -> List[str]:
+    # CSV-era rows carry pipe-joined strings, run_once results carry lists
+    if not v:
+        return []
+    if isinstance(v, str):
+        return [x for x in v.split("|") if x]
+    return [x for x in v if x]
+
+
+def source_key(meta: Dict) -> str:
+    # retrieval_sources entries are llama-index node metadata; the file name is stable across
+    # absolute/relative paths and matches the basenames in rag_index/manifest.json
+    return meta.get("file_name") or os.path.basename(meta.get("file_path") or "")
+
+
+def _sources(row: Dict) -> List[str]:
+    return [k for k in (source_key(m) for m in (row.get("retrieval_sources") or []) if isinstance(m, dict)) if k]
+
+
+def _jurisdictions(row: Dict) -> List[str]:
+    # named in the feature (run_once's "jurisdictions", from catalog.matcher), plus those the
+    # catalog rules came from; older records only have the latter
+    js = set(_as_list(row.get("jurisdictions")))
+    js.update(r.split(":", 1)[0] for r in _as_list(row.get("catalog_rule_ids")) if ":" in r)
+    return sorted(js)
+
+
+class ResultsStore:
+    """
+    Append-only decision history in SQLite, indexed by regulation and catalog rule id.
+    Full run_once results are kept as JSON in decisions.record.
+    """
+
+    def __init__(self, path: str = RESULTS_DB):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # decision_sources is new in v1: index the retrieval sources of existing decisions
+            with self._db:
+                for did, record in self._db.execute("SELECT id, record FROM decisions").fetchall():
+                    srcs = set(_sources(json.loads(record)))
+                    self._db.executemany("INSERT INTO decision_sources (source, decision_id) VALUES (?, ?)", [(x, did) for x in srcs])
+        if version < 2:
+            # decision_jurisdictions is new in v2
+            with self._db:
+                for did, record in self._db.execute("SELECT id, record FROM decisions").fetchall():
+                    js = _jurisdictions(json.loads(record))
+                    self._db.executemany("INSERT INTO decision_jurisdictions (jurisdiction, decision_id) VALUES (?, ?)", [(j, did) for j in js])
+        self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    def append(self, row: Dict) -> int:
+        return self.append_many([row])[0]
+
+    def append_many(self, rows: Iterable[Dict]) -> List[int]:
+        ids = []
+        with self._lock, self._db:
+            for row in rows:
+                cur = self._db.execute(
+                    "INSERT INTO decisions (feature_name, needs_geo_compliance, confidence, timestamp, record) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        row["feature_name"],
+                        int(bool(row.get("needs_geo_compliance"))),
+                        row.get("confidence"),
+                        row.get("timestamp"),
+                        json.dumps(row, ensure_ascii=False, default=str),
+                    ),
+                )
+                did = cur.lastrowid
+                regs = set(_as_list(row.get("regulations")))
+                rules = set(_as_list(row.get("catalog_rule_ids")))
+                self._db.executemany("INSERT INTO decision_regs (reg, decision_id) VALUES (?, ?)", [(r, did) for r in regs])
+                self._db.executemany("INSERT INTO decision_rules (rule_id, decision_id) VALUES (?, ?)", [(r, did) for r in rules])
+                self._db.executemany("INSERT INTO decision_sources (source, decision_id) VALUES (?, ?)", [(x, did) for x in set(_sources(row))])
+                self._db.executemany("INSERT INTO decision_jurisdictions (jurisdiction, decision_id) VALUES (?, ?)", [(j, did) for j in _jurisdictions(row)])
+                ids.append(did)
+        return ids
+
+    def _features_by(self, table: str, column: str, keys: Iterable[str], top_n: int) -> List[str]:
+        keys = [k for k in dict.fromkeys(keys or []) if k]
+        if not keys:
+            return []
+        marks = ",".join("?" * len(keys))
+        sql = (
+            f"SELECT d.feature_name FROM decisions d WHERE d.id IN "
+            f"(SELECT decision_id FROM {table} WHERE {column} IN ({marks})) "
+            f"ORDER BY d.id LIMIT ?"
+        )
+        with self._lock:
+            return [r[0] for r in self._db.execute(sql, (*keys, top_n))]
+
+    def features_by_regulation(self, regs: Iterable[str], top_n: int = 5) -> List[str]:
+        """
+        Feature names of prior decisions sharing any of `regs`, in insertion order.
+        """
+        return self._features_by("decision_regs", "reg", regs, top_n)
+
+    def features_by_rule(self, rule_ids: Iterable[str], top_n: int = 5) -> List[str]:
+        """
+        Feature names of prior decisions that used any of the catalog rule ids ("J:rule_id").
+        """
+        return self._features_by("decision_rules", "rule_id", rule_ids, top_n)
+
+    def _latest_using(self, table: str, column: str, keys: List[str]) -> List[tuple]:
+        # (key, decision_id, timestamp) for the newest decision of each feature only
+        out = []
+        for i in range(0, len(keys), _IN_CHUNK):
+            chunk = keys[i:i + _IN_CHUNK]
+            sql = (
+                f"SELECT t.{column}, d.id, d.timestamp FROM {table} t JOIN decisions d ON d.id = t.decision_id "
+                f"WHERE t.{column} IN ({','.join('?' * len(chunk))}) "
+                f"AND d.id IN (SELECT MAX(id) FROM decisions GROUP BY feature_name)"
+            )
+            with self._lock:
+                out.extend(self._db.execute(sql, chunk).fetchall())
+        return out
+
+    def affected_decisions(self, rules: Dict[str, float], sources: Dict[str, float],
+                           jurisdictions: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """
+        Current decisions (newest per feature) whose evidence changed after they were made.
+        rules: {"J:rule_id": changed_at}, sources: {file name: changed_at},
+        jurisdictions: {J: changed_at} for laws added to a jurisdiction the decision named
+        or drew catalog rules from (even one that had no rules yet). Returns [{"decision_id", "feature_name", "feature_description",
+        "needs_geo_compliance", "confidence", "timestamp", "rules", "sources",
+        "jurisdictions"}] with the changed keys each decision used, unordered.
+        """
+        hits: Dict[int, Dict] = {}
+
+        def _hit(kind: str, key: str, did: int, ts: Optional[float], changed_at: float) -> None:
+            if ts is not None and ts >= changed_at:
+                return  # decided after the change, already saw the new evidence
+            hits.setdefault(did, {"rules": set(), "sources": set(), "jurisdictions": set()})[kind].add(key)
+
+        for rid, did, ts in self._latest_using("decision_rules", "rule_id", list(rules)):
+            _hit("rules", rid, did, ts, rules[rid])
+        for src, did, ts in self._latest_using("decision_sources", "source", list(sources)):
+            _hit("sources", src, did, ts, sources[src])
+        js = jurisdictions or {}
+        for j, did, ts in self._latest_using("decision_jurisdictions", "jurisdiction", list(js)):
+            _hit("jurisdictions", j, did, ts, js[j])
+
+        out = []
+        for did, h in hits.items():
+            rec = self.get(did) or {}
+            out.append({
+                "decision_id": did,
+                "feature_name": rec.get("feature_name"),
+                "feature_description": rec.get("feature_description"),
+                "needs_geo_compliance": rec.get("needs_geo_compliance"),
+                "confidence": rec.get("confidence"),
+                "timestamp": rec.get("timestamp"),
+                **{k: sorted(v) for k, v in h.items()},
+            })
+        return out
+
+    def current_ids(self, decision_ids: Iterable[int]) -> Set[int]:
+        """
+        The subset of decision_ids not superseded by a newer decision for the same feature.
+        """
+        ids = list(dict.fromkeys(decision_ids))
+        out: Set[int] = set()
+        for i in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[i:i + _IN_CHUNK]
+            sql = (
+                f"SELECT d.id FROM decisions d WHERE d.id IN ({','.join('?' * len(chunk))}) "
+                f"AND NOT EXISTS (SELECT 1 FROM decisions n WHERE n.feature_name = d.feature_name AND n.id > d.id)"
+            )
+            with self._lock:
+                out.update(r[0] for r in self._db.execute(sql, chunk))
+        return out
+
+    def get(self, decision_id: int) -> Optional[Dict]:
+        with self._lock:
+            r = self._db.execute("SELECT record FROM decisions WHERE id = ?", (decision_id,)).fetchone()
+        return json.loads(r[0]) if r else None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM decisions").fetchone()[0]
+
+    def import_csv(self, csv_path: str) -> int:
+        """
+        One-off migration of an outputs.csv written by agents.runners.append_csv.
+        """
+        from store.audit_sink import read_records
+        rows = []
+        # rotated, compressed segments (outputs.000001.csv.gz, ...) first, then the active file
+        for r in read_records(csv_path, fmt="csv"):
+            row = dict(r)
+            for k in ("classifier_A", "classifier_B", "auditor_strict", "auditor_risk", "retrieval_sources", "models"):
+                try:
+                    row[k] = json.loads(row.get(k) or "null")
+                except ValueError:
+                    pass
+            row["needs_geo_compliance"] = str(row.get("needs_geo_compliance")).lower() == "true"
+            row["confidence"] = float(row["confidence"]) if row.get("confidence") else None
+            row["timestamp"] = float(row["timestamp"]) if row.get("timestamp") else None
+            row["regulations"] = _as_list(row.get("regulations"))
+            row["catalog_rule_ids"] = _as_list(row.get("catalog_rule_ids"))
+            rows.append(row)
+        self.append_many(rows)
+        return len(rows)
+
+
+_store: Optional[ResultsStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> ResultsStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+        return _store
+
+
+if __name__ == "__main__":
+    # python -m store.results data/outputs.csv  -> import existing CSV history
+    src = sys.argv[1] if len(sys.argv) > 1 else os.path.join(PROJECT_ROOT, "data", "outputs.csv")
+    print(f"imported {get_store().import_csv(src)} rows into {RESULTS_DB}")
@@ -1,7 +1,8 @@
-import os, json, hashlib
-from typing import List, Dict, Optional
-from markitdown import MarkItDown
-from catalog.llm_extract import extract_struct
+import os, json, time, tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple
+from rag.embed_cache import file_sha256
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
 PDF_DIR = os.path.join(PROJECT_ROOT, "files", "laws")
@@ -9,7 +10,11 @@ MD_DIR = os.path.join(PDF_DIR, "md")
 CATALOG_JSON = os.path.join(PROJECT_ROOT, "files", "main", "directory.json")
 
 
+# FAST_MODE=1: only re-extract laws whose markdown hash changed; FAST_MODE=0: re-extract everything
 FAST_MODE = os.getenv("FAST_MODE", "1") == "1"  
+# PDF→MD conversion is cheap per process; each extraction worker loads its own LLM copy
+CONVERT_WORKERS = int(os.getenv("CATALOG_CONVERT_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACT_WORKERS = int(os.getenv("CATALOG_EXTRACT_WORKERS", "1"))
 
 
 def _read_json(path: str) -> Optional[List[Dict]]:
@@ -22,9 +27,19 @@ def _read_json(path: str) -> Optional[List[Dict]]:
     return []
 
 def _write_json(path: str, data: List[Dict]) -> None:
+    # write to a temp file in the same dir and rename, so readers never see a partial catalog
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    fd, tmp = tempfile.mkstemp(prefix=".directory.", suffix=".json", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
 
 def _upsert(catalog: List[Dict], item: Dict) -> List[Dict]:
     by_key = { (c.get("md_file") or c.get("filename")): c for c in catalog }
@@ -33,37 +48,89 @@ def _upsert(catalog: List[Dict], item: Dict) -> List[Dict]:
     return list(by_key.values())
 
 
-def _ensure_md_from_pdfs() -> List[str]:
+def _convert_pdf(pdf_path: str, md_path: str) -> Tuple[str, Optional[str]]:
     """
-    Ensure each PDF has a corresponding .md.
-    Convert PDF→MD only if the .md doesn't exist.
-    Return a list of absolute md file paths to process.
+    Worker: PDF→MD with MarkItDown. Returns (md_path, error or None).
+    """
+    # imported here: markitdown[all] is slow to import and unneeded when nothing changed
+    from markitdown import MarkItDown
+    try:
+        res = MarkItDown().convert(pdf_path)
+        tmp = md_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(res.text_content)
+        os.replace(tmp, md_path)
+        return md_path, None
+    except Exception as e:
+        return md_path, str(e)
+
+def _extract_md(md_path: str) -> Tuple[str, str, Dict, Optional[str], float]:
+    """
+    Worker: run LLM extraction on one markdown law.
+    Returns (md_path, md_sha256, struct, error or None, seconds).
+    """
+    # imported here so the parent (and conversion workers) never load the LLM
+    from catalog.llm_extract import extract_struct
+    t0 = time.perf_counter()
+    sha = file_sha256(md_path)
+    try:
+        with open(md_path, "r", encoding="utf-8") as f:
+            md_text = f.read()
+        struct = extract_struct(md_text)
+        err = None
+    except Exception as e:
+        struct = {"jurisdiction": "TBD", "regulatory_area": "TBD", "rules": []}
+        err = str(e)
+    return md_path, sha, struct, err, time.perf_counter() - t0
+
+def _catalog_entry(catalog: List[Dict], md_name: str) -> Optional[Dict]:
+    for c in catalog:
+        if (c.get("md_file") or "").endswith(md_name):
+            return c
+    return None
+
+def _ensure_md_from_pdfs(catalog: List[Dict]) -> Tuple[List[str], Dict[str, str]]:
+    """
+    Ensure each PDF has a corresponding, up-to-date .md.
+    Convert PDF→MD (in a process pool) when the .md is missing or the PDF's hash
+    differs from the one recorded in the catalog.
+    Return (md file paths to consider, {md_path: pdf_sha256}).
     """
     os.makedirs(MD_DIR, exist_ok=True)
-    md = MarkItDown()
     md_paths: List[str] = []
+    pdf_hashes: Dict[str, str] = {}
+    jobs: List[Tuple[str, str]] = []
 
-    for filename in os.listdir(PDF_DIR):
+    for filename in sorted(os.listdir(PDF_DIR)):
         if not filename.lower().endswith(".pdf"):
             continue
         pdf_path = os.path.join(PDF_DIR, filename)
         base = os.path.splitext(filename)[0]
         md_path = os.path.join(MD_DIR, base + ".md")
+        pdf_sha = file_sha256(pdf_path)
+        pdf_hashes[md_path] = pdf_sha
+        prev = _catalog_entry(catalog, base + ".md") or {}
 
-        if not os.path.exists(md_path):
-            try:
-                res = md.convert(pdf_path)
-                with open(md_path, "w", encoding="utf-8") as f:
-                    f.write(res.text_content)
-                print(f"PDF→MD: created {os.path.basename(md_path)}")
-            except Exception as e:
-                print(f"X PDF→MD failed on {filename}: {e}")
-                continue
+        if not os.path.exists(md_path) or (prev.get("pdf_sha256") and prev["pdf_sha256"] != pdf_sha):
+            jobs.append((pdf_path, md_path))
         else:
-            print(f"skip (MD exists): {os.path.basename(md_path)}")
-
+            print(f"skip (MD up to date): {os.path.basename(md_path)}")
         md_paths.append(md_path)
 
+    if jobs:
+        workers = max(1, min(CONVERT_WORKERS, len(jobs)))
+        if workers == 1:
+            results = [_convert_pdf(p, m) for p, m in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_convert_pdf, *zip(*jobs)))
+        for md_path, err in results:
+            if err:
+                print(f"X PDF→MD failed on {os.path.basename(md_path)}: {err}")
+                md_paths.remove(md_path)
+            else:
+                print(f"PDF→MD: created {os.path.basename(md_path)}")
+
     # Also include any stray MDs that exist without a matching PDF (optional)
     for md_name in os.listdir(MD_DIR):
         if md_name.lower().endswith(".md"):
@@ -71,76 +138,102 @@ def _ensure_md_from_pdfs() -> List[str]:
             if full not in md_paths:
                 md_paths.append(full)
 
-    return sorted(md_paths)
-
-def _md_is_in_catalog(catalog, md_name: str) -> bool:
-    return any((c.get("md_file","").endswith(md_name)) for c in catalog)
+    return sorted(md_paths), pdf_hashes
+
+def _build_artifact(md_path: str, md_sha: str, pdf_sha: Optional[str], struct: Dict) -> Dict:
+    md_name = os.path.basename(md_path)
+    base = os.path.splitext(md_name)[0]
+    pdf_guess = base + ".pdf"
+    art = {
+        "filename": pdf_guess,
+        "original_file": f"files/laws/{pdf_guess}",
+        "md_file": f"files/laws/md/{md_name}",
+        "title": base.replace("_", " "),
+        "regulatory_area": struct.get("regulatory_area", "TBD"),
+        "jurisdiction": struct.get("jurisdiction", "TBD"),
+        "law_identifiers": struct.get("law_identifiers", []),
+        "md_sha256": md_sha,
+        "pdf_sha256": pdf_sha,
+        "rules": [],
+    }
+
+    rules = []
+    for i, r in enumerate(struct.get("rules", []), 1):
+        rid = r.get("rule_id") or f"{base}-R{i}"
+        rules.append({
+            "rule_id": rid,
+            "title": r.get("title", f"Rule {i}"),
+            "section": r.get("section"),
+            "text": (r.get("text") or "")[:4000],
+            "keywords": r.get("keywords", []),
+            "citations": r.get("citations", []),
+        })
+    art["rules"] = rules
+    return art
 
 def update_catalog():
-    md_paths = _ensure_md_from_pdfs()
+    # imported here, like the workers' imports: catalog.changes is only needed when saving
+    from catalog.changes import diff_law, record_changes
     catalog = _read_json(CATALOG_JSON) or []
+    md_paths, pdf_hashes = _ensure_md_from_pdfs(catalog)
     updated = catalog[:]
+    changes: List[Dict] = []
 
+    # 1. decide what needs extraction from content hashes
+    todo: List[str] = []
     for md_path in md_paths:
         md_name = os.path.basename(md_path)
-        base = os.path.splitext(md_name)[0]
-        pdf_guess = base + ".pdf"
-        print(f"→ extracting from {md_name}")
-
-        if FAST_MODE and _md_is_in_catalog(catalog, md_name):
-            print("   fast mode: already in catalog, skipping extraction")
-            continue
-
-        # 1. read md text
-        try:
-            with open(md_path, "r", encoding="utf-8") as f:
-                md_text = f.read()
-        except Exception as e:
-            print(f"X read failed: {e}")
+        prev = _catalog_entry(catalog, md_name)
+        if FAST_MODE and prev and prev.get("md_sha256") == file_sha256(md_path):
+            print(f"skip (unchanged): {md_name}")
+            pdf_sha = pdf_hashes.get(md_path)
+            if pdf_sha and prev.get("pdf_sha256") != pdf_sha:
+                # the PDF changed but converts to the same markdown: record its hash,
+                # or _ensure_md_from_pdfs reconverts it on every run
+                updated = _upsert(updated, dict(prev, pdf_sha256=pdf_sha))
             continue
-
-        # 2. run extraction (jurisdiction, rules, etc.)
+        todo.append(md_path)
+
+    # 2. run extraction (jurisdiction, rules, etc.), one law per worker process
+    if todo:
+        workers = max(1, min(EXTRACT_WORKERS, len(todo)))
+        print(f"→ extracting {len(todo)} law(s) with {workers} worker(s)")
+        if workers == 1:
+            results = map(_extract_md, todo)
+            pool = None
+        else:
+            # spawn: torch/tokenizers are not fork-safe once initialized
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+            results = pool.map(_extract_md, todo)
         try:
-            struct = extract_struct(md_text)
-        except Exception as e:
-            print(f"X LLM extract failed: {e}")
-            struct = {"jurisdiction": "TBD", "regulatory_area": "TBD", "rules": []}
-
-        # 3. build artifact
-        art = {
-            "filename": pdf_guess,
-            "original_file": f"files/laws/{pdf_guess}",
-            "md_file": f"files/laws/md/{md_name}",
-            "title": base.replace("_", " "),
-            "regulatory_area": struct.get("regulatory_area", "TBD"),
-            "jurisdiction": struct.get("jurisdiction", "TBD"),
-            "rules": [],
-        }
-
-        rules = []
-        for i, r in enumerate(struct.get("rules", []), 1):
-            rid = r.get("rule_id") or f"{base}-R{i}"
-            rules.append({
-                "rule_id": rid,
-                "title": r.get("title", f"Rule {i}"),
-                "section": r.get("section"),
-                "text": (r.get("text") or "")[:4000],
-                "keywords": r.get("keywords", []),
-                "citations": r.get("citations", []),
-            })
-        art["rules"] = rules
-
-        # 4. merge into catalog
-        updated = _upsert(updated, art)
-        print(f"added {md_name} ({len(rules)} rules)")
-
-    # 5. write to disk
+            for md_path, md_sha, struct, err, secs in results:
+                md_name = os.path.basename(md_path)
+                if err:
+                    # keep the previous entry (and its old md_sha256, so FAST_MODE retries
+                    # this law next run) instead of replacing it with an empty TBD stub
+                    print(f"X LLM extract failed on {md_name}: {err}; keeping previous entry")
+                    continue
+                # 3. build artifact and merge into catalog
+                art = _build_artifact(md_path, md_sha, pdf_hashes.get(md_path), struct)
+                change = diff_law(_catalog_entry(catalog, md_name), art)
+                if change:
+                    changes.append(change)
+                updated = _upsert(updated, art)
+                print(f"added {md_name} ({len(art['rules'])} rules, {secs:.1f}s)")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    # 4. write to disk (atomically)
     _write_json(CATALOG_JSON, updated)
-    print("saved")
+    # logged after the catalog is on disk; run_batch.py --reaudit reads it to find affected decisions
+    if changes:
+        record_changes(changes)
+    print(f"saved ({len(changes)} law(s) changed)")
 
 
 if __name__ == "__main__":
     # If you run directly (not via `python -m`), ensure project root is on sys.path if needed:
     # import sys
     # sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-    update_catalog()
\ No newline at end of file
+    update_catalog()